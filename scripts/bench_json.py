@@ -0,0 +1,186 @@
+"""
+Micro-benchmark for the JSON decoders supported by the OpenDota MCP server.
+
+Builds synthetic payloads shaped like the largest OpenDota responses
+(heroStats, proPlayers, publicMatches and a parsed match) and times each
+installed decoder on them.
+
+Usage:
+    python scripts/bench_json.py [--repeat N]
+"""
+
+import argparse
+import json
+import random
+import timeit
+from typing import Any, Callable, Dict, List
+
+
+def hero_stats_payload() -> List[Dict[str, Any]]:
+    """Roughly the shape and size of /heroStats."""
+    heroes = []
+    for hero_id in range(1, 125):
+        hero = {
+            "id": hero_id,
+            "name": f"npc_dota_hero_{hero_id}",
+            "localized_name": f"Hero {hero_id}",
+            "primary_attr": random.choice(["str", "agi", "int", "all"]),
+            "attack_type": random.choice(["Melee", "Ranged"]),
+            "roles": ["Carry", "Escape", "Nuker"],
+            "img": f"/apps/dota2/images/heroes/{hero_id}.png",
+            "base_health": 120,
+            "base_mana": 75,
+            "move_speed": 300,
+            "pro_pick": random.randint(0, 500),
+            "pro_win": random.randint(0, 250),
+            "pro_ban": random.randint(0, 800),
+        }
+        for bracket in range(1, 9):
+            hero[f"{bracket}_pick"] = random.randint(1000, 100000)
+            hero[f"{bracket}_win"] = random.randint(500, 50000)
+        heroes.append(hero)
+    return heroes
+
+
+def pro_players_payload() -> List[Dict[str, Any]]:
+    """Roughly the shape and size of /proPlayers."""
+    return [
+        {
+            "account_id": 10000000 + i,
+            "steamid": str(76561197960265728 + i),
+            "avatar": f"https://avatars.steamstatic.com/{i:040x}.jpg",
+            "personaname": f"player{i}",
+            "last_login": None,
+            "loccountrycode": random.choice(["US", "UA", "PE", "CN", "SE"]),
+            "name": f"Pro {i}",
+            "country_code": random.choice(["us", "ua", "pe", "cn", "se"]),
+            "fantasy_role": random.randint(0, 2),
+            "team_id": random.randint(1, 500),
+            "team_name": f"Team {random.randint(1, 500)}",
+            "team_tag": "TAG",
+            "is_locked": True,
+            "is_pro": True,
+        }
+        for i in range(4000)
+    ]
+
+
+def public_matches_payload() -> List[Dict[str, Any]]:
+    """Roughly the shape and size of /publicMatches."""
+    return [
+        {
+            "match_id": 7000000000 + i,
+            "match_seq_num": 6000000000 + i,
+            "radiant_win": bool(i % 2),
+            "start_time": 1700000000 + i,
+            "duration": random.randint(900, 4000),
+            "lobby_type": 7,
+            "game_mode": 22,
+            "avg_rank_tier": random.randint(10, 80),
+            "num_rank_tier": 10,
+            "cluster": 133,
+            "radiant_team": random.sample(range(1, 125), 5),
+            "dire_team": random.sample(range(1, 125), 5),
+        }
+        for i in range(100)
+    ]
+
+
+def match_payload() -> Dict[str, Any]:
+    """Roughly the shape and size of a parsed /matches/{id} document."""
+    minutes = 45
+    players = []
+    for slot in [0, 1, 2, 3, 4, 128, 129, 130, 131, 132]:
+        players.append(
+            {
+                "account_id": random.randint(1, 10**9),
+                "player_slot": slot,
+                "hero_id": random.randint(1, 124),
+                "kills": random.randint(0, 20),
+                "deaths": random.randint(0, 20),
+                "assists": random.randint(0, 30),
+                "gold_per_min": random.randint(200, 900),
+                "xp_per_min": random.randint(200, 1000),
+                "gold_t": [random.randint(0, 40000) for _ in range(minutes)],
+                "xp_t": [random.randint(0, 40000) for _ in range(minutes)],
+                "lh_t": [random.randint(0, 600) for _ in range(minutes)],
+                "dn_t": [random.randint(0, 60) for _ in range(minutes)],
+                "times": list(range(0, minutes * 60, 60)),
+                "purchase_log": [
+                    {"time": random.randint(0, 2700), "key": "item_tango"}
+                    for _ in range(60)
+                ],
+                "damage": {
+                    f"npc_dota_hero_{h}": random.randint(0, 9999) for h in range(5)
+                },
+            }
+        )
+    return {
+        "match_id": 7000000000,
+        "duration": minutes * 60,
+        "start_time": 1700000000,
+        "radiant_win": True,
+        "radiant_score": 40,
+        "dire_score": 25,
+        "radiant_gold_adv": [random.randint(-20000, 20000) for _ in range(minutes)],
+        "radiant_xp_adv": [random.randint(-20000, 20000) for _ in range(minutes)],
+        "chat": [
+            {"time": i * 30, "type": "chat", "key": "gg", "slot": i % 10}
+            for i in range(80)
+        ],
+        "objectives": [
+            {"time": i * 60, "type": "CHAT_MESSAGE_TOWER_KILL"} for i in range(30)
+        ],
+        "players": players,
+    }
+
+
+def available_decoders() -> Dict[str, Callable[[bytes], Any]]:
+    """Collect the decoders that are installed."""
+    decoders: Dict[str, Callable[[bytes], Any]] = {"json": json.loads}
+    try:
+        import orjson
+
+        decoders["orjson"] = orjson.loads
+    except ImportError:
+        pass
+    try:
+        import msgspec
+
+        decoders["msgspec"] = msgspec.json.decode
+    except ImportError:
+        pass
+    return decoders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=50, help="decodes per timing")
+    args = parser.parse_args()
+
+    random.seed(0)
+    payloads = {
+        "heroStats": hero_stats_payload(),
+        "proPlayers": pro_players_payload(),
+        "publicMatches": public_matches_payload(),
+        "matches/{id}": match_payload(),
+    }
+    decoders = available_decoders()
+
+    print(f"{'payload':<16}{'size':>10}  " + "".join(f"{n:>12}" for n in decoders))
+    for name, payload in payloads.items():
+        body = json.dumps(payload).encode()
+        timings = []
+        for decode in decoders.values():
+            seconds = min(
+                timeit.repeat(lambda: decode(body), number=args.repeat, repeat=3)
+            )
+            timings.append(seconds / args.repeat * 1000)
+        print(
+            f"{name:<16}{len(body) / 1024:>8.0f}KB  "
+            + "".join(f"{ms:>10.3f}ms" for ms in timings)
+        )
+
+
+if __name__ == "__main__":
+    main()
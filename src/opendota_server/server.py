@@ -10,18 +10,76 @@ Usage:
 
 Environment Variables:
     OPENDOTA_API_KEY - Your OpenDota API key (optional but recommended to avoid rate limits)
+    OPENDOTA_HTTP_MAX_CONNECTIONS - Connection pool size for the shared HTTP client
+    OPENDOTA_HTTP_MAX_KEEPALIVE - Idle keep-alive connections kept in the pool
+    OPENDOTA_HTTP_KEEPALIVE_EXPIRY - Seconds an idle connection is kept open
+    OPENDOTA_HTTP2 - Set to 1 to enable HTTP/2 (install the http2 extra)
+    OPENDOTA_MAX_REQUESTS_PER_MINUTE - Per-minute request budget (default by key tier)
+    OPENDOTA_MAX_REQUESTS_PER_DAY - Per-day request budget, 0 disables it
+    OPENDOTA_MAX_RATE_LIMIT_WAIT - Longest a request may wait for budget, in seconds
+    OPENDOTA_MAX_RETRIES - Retries for transient upstream failures
+    OPENDOTA_CIRCUIT_BREAKER_THRESHOLD - Failures in a row before an endpoint fails fast
+    OPENDOTA_CIRCUIT_BREAKER_COOLDOWN - Seconds an endpoint fails fast once tripped
+    OPENDOTA_JSON_BACKEND - JSON decoder: auto, orjson, msgspec or json
+    OPENDOTA_FANOUT_CONCURRENCY - Max concurrent upstream requests per tool call
+    OPENDOTA_CACHE_MAX_ENTRIES - Max number of cached API responses
+    OPENDOTA_CACHE_MAX_BYTES - Approximate memory budget for cached responses
+    OPENDOTA_CACHE_TTLS - Per-endpoint TTL overrides, e.g. "heroStats=7200,health=0"
+    OPENDOTA_CACHE_MAX_STALENESS - How long expired entries are served while refreshing
+    OPENDOTA_CACHE_FULL_DOCUMENTS - Set to 1 to cache whole match documents unprojected
+    OPENDOTA_CACHE_COMPRESSION - Codec for large cache entries: auto, zstd, zlib or none
+    OPENDOTA_CACHE_COMPRESS_MIN_BYTES - Entries at least this large are compressed
+    OPENDOTA_NEGATIVE_CACHE_TTL - Seconds to remember 404/410 responses
+    OPENDOTA_SERVER_ERROR_HOLD_DOWN - Seconds to pause an endpoint after repeated 5xx
+    OPENDOTA_DISK_CACHE_PATH - SQLite file for a persistent response cache
+    OPENDOTA_DISK_CACHE_MAX_BYTES - Disk budget for the persistent response cache
+    OPENDOTA_MATCH_HISTORY_PATH - SQLite file for synced player match histories
+        (default: beside the disk cache or in ~/.cache; ":memory:" opts out)
+    OPENDOTA_MATCH_HISTORY_SYNC_INTERVAL - Seconds before a history is synced again
+    OPENDOTA_CONSTANTS_REFRESH_INTERVAL - Seconds between constants refreshes (0: off)
+    OPENDOTA_NAME_INDEX_MAX_PLAYERS - Players remembered by the local name index
+    OPENDOTA_SEARCH_LOCAL_MIN_HITS - Confident local matches that skip upstream search
 """
 
 import asyncio
+import bisect
+import contextlib
+import difflib
+import heapq
+import json
 import logging
+import math
 import os
+import random
+import re
+import sqlite3
+import threading
 import time
+import zlib
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Dict,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import httpx
-from mcp.server.fastmcp import FastMCP
+import numpy as np
+from mcp.server.fastmcp import Context, FastMCP
+from pydantic import ValidationError
 
 # Configure logging
 log_level = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -32,8 +90,31 @@ logging.basicConfig(
 )
 logger = logging.getLogger("opendota-server")
 
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Own server-lifetime resources for the duration of the MCP session."""
+    get_http_client()
+    tasks = [asyncio.create_task(start_cache_cleanup_task())]
+    if CONSTANTS_REFRESH_INTERVAL > 0:
+        tasks.append(asyncio.create_task(start_constants_refresh_task()))
+    spawn_background(startup())
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        await close_http_client()
+        if disk_cache is not None:
+            await asyncio.to_thread(disk_cache.close)
+        await asyncio.to_thread(match_history.close)
+
+
 # Initialize FastMCP server
-mcp = FastMCP("OpenDota")
+mcp = FastMCP("OpenDota", lifespan=server_lifespan)
 
 # Constants
 OPENDOTA_API_BASE = "https://api.opendota.com/api"
@@ -43,15 +124,70 @@ OPENDOTA_API_KEY = os.getenv("OPENDOTA_API_KEY", "")
 # Add API key to requests if available
 API_PARAMS = {"api_key": OPENDOTA_API_KEY} if OPENDOTA_API_KEY else {}
 
-# Request rate limiting
-MAX_REQUESTS_PER_MINUTE = 60
-request_timestamps = []
+# Request rate limiting. Without an API key OpenDota allows 60 requests per
+# minute and 2000 per day; keyed requests get 3000 per minute and no daily cap.
+MAX_REQUESTS_PER_MINUTE = int(
+    os.getenv("OPENDOTA_MAX_REQUESTS_PER_MINUTE", "3000" if OPENDOTA_API_KEY else "60")
+)
+MAX_REQUESTS_PER_DAY = int(
+    os.getenv("OPENDOTA_MAX_REQUESTS_PER_DAY", "0" if OPENDOTA_API_KEY else "2000")
+)
+MAX_RATE_LIMIT_WAIT = float(os.getenv("OPENDOTA_MAX_RATE_LIMIT_WAIT", "60"))
+RATE_LIMIT_BACKOFF = 10.0  # Hold-off after a 429 without a Retry-After header
+RATE_LIMIT_MESSAGE = "Rate limit exceeded. Consider using an API key for more requests."
+
+# Retries for transient failures, with full-jitter exponential backoff
+MAX_RETRIES = int(os.getenv("OPENDOTA_MAX_RETRIES", "2"))
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+# Per-endpoint circuit breaker
+CIRCUIT_BREAKER_THRESHOLD = int(os.getenv("OPENDOTA_CIRCUIT_BREAKER_THRESHOLD", "5"))
+CIRCUIT_BREAKER_COOLDOWN = float(os.getenv("OPENDOTA_CIRCUIT_BREAKER_COOLDOWN", "30"))
+
+# Shared HTTP client settings
+HTTP_TIMEOUT = 10.0
+HTTP_MAX_CONNECTIONS = int(os.getenv("OPENDOTA_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("OPENDOTA_HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("OPENDOTA_HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("OPENDOTA_HTTP2", "").lower() in ("1", "true", "yes")
+_http_client: Optional[httpx.AsyncClient] = None
+
+# JSON decoding backend. "auto" picks the fastest installed decoder; the large
+# heroStats, proPlayers and match payloads make stdlib decoding noticeable.
+JSON_BACKEND = os.getenv("OPENDOTA_JSON_BACKEND", "auto").lower()
+
+# Upper bound on concurrent upstream requests issued by a single tool call
+FANOUT_CONCURRENCY = int(os.getenv("OPENDOTA_FANOUT_CONCURRENCY", "4"))
+BULK_MAX_MATCHES = 50  # Most matches a single bulk request may ask for
+BULK_MAX_PLAYERS = 50  # Most players a single bulk request may ask for
+BATCH_MAX_CALLS = 20  # Most tool invocations a single batch may contain
+
+# Local player-name index consulted by search_player before the upstream search
+NAME_INDEX_MAX_PLAYERS = int(os.getenv("OPENDOTA_NAME_INDEX_MAX_PLAYERS", "50000"))
+SEARCH_LOCAL_MIN_HITS = int(os.getenv("OPENDOTA_SEARCH_LOCAL_MIN_HITS", "1"))
+SEARCH_LOCAL_MIN_SIMILARITY = 0.8  # Similarity at which a local match is confident
+SEARCH_LOCAL_CUTOFF = 0.3  # Lowest similarity reported from the local index
+
+# Constants snapshot shipped with the server, refreshed from the upstream
+# constants endpoints while running
+CONSTANTS_SNAPSHOT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "constants.json"
+)
+CONSTANTS_SNAPSHOT_VERSION = 1
+CONSTANTS_REFRESH_INTERVAL = float(
+    os.getenv("OPENDOTA_CONSTANTS_REFRESH_INTERVAL", str(24 * 3600))
+)
+CONSTANTS_REFRESH_DELAY = 5.0  # Seconds after startup before the first refresh
+CONSTANTS_REFRESH_MIN_BUDGET = 0.25  # Share of the daily budget a refresh leaves
 
 
 # Models for response data
 @dataclass
 class Player:
     """Player information from OpenDota"""
+
     account_id: int
     personaname: Optional[str] = None
     name: Optional[str] = None
@@ -69,6 +205,7 @@ class Player:
 @dataclass
 class Match:
     """Match information from OpenDota"""
+
     match_id: int
     duration: int
     start_time: int
@@ -80,9 +217,11 @@ class Match:
     region: Optional[int] = None
     players: List[Dict[str, Any]] = field(default_factory=list)
 
+
 @dataclass
 class Hero:
     """Hero information from OpenDota"""
+
     id: int
     name: str
     localized_name: str
@@ -91,31 +230,329 @@ class Hero:
     roles: List[str] = field(default_factory=list)
 
 
+# Rate limiting
+class RateLimitBudget:
+    """A budget of `limit` requests per `period` seconds, tracked with GCRA.
+
+    The generic cell rate algorithm keeps a single theoretical arrival time
+    (TAT) instead of a list of timestamps, so checking and reserving a slot
+    are both O(1).
+    """
+
+    def __init__(self, name: str, limit: int, period: float):
+        self.name = name
+        self.limit = limit
+        self.period = period
+        self.interval = period / limit
+        self.tolerance = period - self.interval
+        self.tat = 0.0
+
+    def delay(self, now: float) -> float:
+        """Seconds until a request arriving at `now` conforms to the budget."""
+        return max(0.0, self.tat - self.tolerance - now)
+
+    def reserve(self, at: float):
+        """Consume one slot for a request sent at time `at`."""
+        self.tat = max(self.tat, at) + self.interval
+
+    def remaining(self, now: float) -> int:
+        """Number of requests that could be sent right now without waiting."""
+        available = math.floor((now + self.tolerance - self.tat) / self.interval) + 1
+        return max(0, min(self.limit, available))
+
+    def sync(self, now: float, remaining: int):
+        """Never report more budget than the upstream API says is left."""
+        self.tat = max(self.tat, now + self.tolerance - (remaining - 1) * self.interval)
+
+
+class RateLimiter:
+    """Async rate limiter enforcing per-minute and per-day request budgets.
+
+    Each caller reserves its slot before sleeping, so concurrent callers are
+    scheduled in arrival order and bursts can't overshoot the budget. Rate
+    limit headers and 429 responses from OpenDota push the schedule back.
+    """
+
+    def __init__(
+        self,
+        per_minute: int,
+        per_day: int = 0,
+        max_wait: float = MAX_RATE_LIMIT_WAIT,
+    ):
+        self.budgets = [RateLimitBudget("minute", per_minute, 60.0)]
+        if per_day > 0:
+            self.budgets.append(RateLimitBudget("day", per_day, 86400.0))
+        self.max_wait = max_wait
+        self.blocked_until = 0.0
+
+    async def acquire(self) -> bool:
+        """Wait for a request slot.
+
+        Returns False without consuming budget when the wait would exceed
+        `max_wait`, so callers can fail fast instead of hanging.
+        """
+        now = time.monotonic()
+        start = max(
+            [now, self.blocked_until] + [now + b.delay(now) for b in self.budgets]
+        )
+        wait = start - now
+        if wait > self.max_wait:
+            logger.warning(f"Rate limit budget exhausted for the next {wait:.0f}s")
+            return False
+
+        for budget in self.budgets:
+            budget.reserve(start)
+
+        if wait > 0:
+            logger.warning(f"Rate limit approaching, waiting {wait:.2f} seconds")
+            await asyncio.sleep(wait)
+        return True
+
+    def update_from_response(self, response: httpx.Response):
+        """Adapt the schedule to OpenDota's rate limit feedback."""
+        now = time.monotonic()
+        for budget in self.budgets:
+            header = response.headers.get(f"x-rate-limit-remaining-{budget.name}")
+            if header is not None and header.lstrip("-").isdigit():
+                budget.sync(now, int(header))
+
+        if response.status_code == 429:
+            retry_after = parse_retry_after(response)
+            delay = retry_after if retry_after is not None else RATE_LIMIT_BACKOFF
+            logger.warning(f"OpenDota returned 429, backing off for {delay:.0f}s")
+            self.blocked_until = max(self.blocked_until, now + delay)
+            self.budgets[0].sync(now, 0)
+
+    def remaining(self) -> Dict[str, int]:
+        """Report the request budget left in each window."""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return {budget.name: 0 for budget in self.budgets}
+        return {budget.name: budget.remaining(now) for budget in self.budgets}
+
+
+def parse_retry_after(response: httpx.Response) -> Optional[float]:
+    """Parse a Retry-After header given in seconds."""
+    value = response.headers.get("retry-after")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+rate_limiter = RateLimiter(MAX_REQUESTS_PER_MINUTE, MAX_REQUESTS_PER_DAY)
+
+
+# Retries and circuit breaking
+class CircuitBreaker:
+    """Per-route circuit breaker for upstream requests.
+
+    After `threshold` consecutive failures a route's circuit opens and its
+    requests fail fast for `cooldown` seconds. Requests are then let through
+    again (half-open): the next success closes the circuit and the next
+    failure re-opens it straight away.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures: Dict[str, int] = {}
+        self._open_until: Dict[str, float] = {}
+
+    def allow(self, route: str) -> bool:
+        """Check whether a request to the route may be sent."""
+        return time.monotonic() >= self._open_until.get(route, 0.0)
+
+    def record_success(self, route: str):
+        """Close the route's circuit."""
+        self._failures.pop(route, None)
+        self._open_until.pop(route, None)
+
+    def record_failure(self, route: str):
+        """Count a failure, opening the circuit once the threshold is reached."""
+        failures = self._failures.get(route, 0) + 1
+        self._failures[route] = failures
+        if failures >= self.threshold or route in self._open_until:
+            logger.warning(
+                f"Circuit open for {route} after {failures} failures, "
+                f"failing fast for {self.cooldown:.0f}s"
+            )
+            self._open_until[route] = time.monotonic() + self.cooldown
+
+
+circuit_breaker = CircuitBreaker(CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_COOLDOWN)
+
+
+def get_endpoint_route(endpoint: str) -> str:
+    """Collapse IDs in an endpoint so all players or matches share one route."""
+    return re.sub(r"\d+", "{id}", endpoint)
+
+
+def is_retryable(response: httpx.Response) -> bool:
+    """Check whether a response is a transient failure worth retrying."""
+    if response.status_code == 429:
+        return "retry-after" in response.headers
+    return response.status_code in RETRYABLE_STATUS_CODES
+
+
+def retry_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given retry attempt."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt))
+
+
 # Helper Functions
-async def apply_rate_limit():
-    """Apply rate limiting to avoid hitting API limits."""
-    global request_timestamps
-
-    # Clean up old timestamps (older than 1 minute)
-    current_time = time.time()
-    request_timestamps = [t for t in request_timestamps if current_time - t < 60]
-
-    # Check if we're at the limit
-    if len(request_timestamps) >= MAX_REQUESTS_PER_MINUTE:
-        # Calculate time to wait
-        oldest_timestamp = min(request_timestamps)
-        time_to_wait = (
-            60 - (current_time - oldest_timestamp) + 0.1
-        )  # Add a small buffer
-
-        if time_to_wait > 0:
+def load_json_decoder(backend: str = "auto") -> Tuple[str, Callable[[bytes], Any]]:
+    """Return the name and decode function of a JSON backend.
+
+    Falls back to the standard library when the requested backend isn't
+    installed.
+    """
+    candidates = ["orjson", "msgspec", "json"] if backend == "auto" else [backend]
+    for name in candidates:
+        if name == "orjson":
+            try:
+                import orjson
+            except ImportError:
+                continue
+            return name, orjson.loads
+        if name == "msgspec":
+            try:
+                import msgspec
+            except ImportError:
+                continue
+            return name, msgspec.json.decode
+        if name == "json":
+            return name, json.loads
+
+    logger.warning(f"JSON backend {backend!r} is not available, using json")
+    return "json", json.loads
+
+
+json_backend, json_loads = load_json_decoder(JSON_BACKEND)
+
+
+def encode_json(data: Any) -> bytes:
+    """Serialize data compactly, as stored by the cache tiers."""
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def _http2_available() -> bool:
+    """Check whether the optional h2 package needed for HTTP/2 is installed."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared, connection-pooled HTTP client, creating it if needed."""
+    global _http_client
+
+    if _http_client is None or _http_client.is_closed:
+        http2 = HTTP2_ENABLED and _http2_available()
+        if HTTP2_ENABLED and not http2:
             logger.warning(
-                f"Rate limit approaching, waiting {time_to_wait:.2f} seconds"
+                "HTTP/2 requested but the h2 package is not installed, using HTTP/1.1"
             )
-            await asyncio.sleep(time_to_wait)
+        _http_client = httpx.AsyncClient(
+            base_url=OPENDOTA_API_BASE,
+            headers={"User-Agent": USER_AGENT},
+            timeout=HTTP_TIMEOUT,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared HTTP client and release its pooled connections."""
+    global _http_client
 
-    # Add current request timestamp
-    request_timestamps.append(time.time())
+    if _http_client is not None:
+        client, _http_client = _http_client, None
+        await client.aclose()
+
+
+def fanout_limit(limit: Optional[int] = None) -> int:
+    """Concurrency for a fan-out of upstream requests.
+
+    `limit` defaults to FANOUT_CONCURRENCY and is lowered to the request
+    budget left, so that when the budget runs low the remaining requests
+    queue here, where cache hits can still overtake them, rather than in the
+    rate limiter.
+    """
+    budget = min(rate_limiter.remaining().values())
+    return max(1, min(limit or FANOUT_CONCURRENCY, budget))
+
+
+async def gather_bounded(
+    *aws: Awaitable[Any], limit: Optional[int] = None
+) -> List[Any]:
+    """Await several coroutines concurrently, at most `limit` at a time.
+
+    `limit` is capped by fanout_limit(). Results are returned in the order
+    the awaitables were given. Coroutines still waiting for a slot when the
+    call is cancelled are closed unstarted.
+    """
+    semaphore = asyncio.Semaphore(fanout_limit(limit))
+
+    async def run(aw: Awaitable[Any]) -> Any:
+        try:
+            async with semaphore:
+                return await aw
+        finally:
+            if asyncio.iscoroutine(aw):
+                aw.close()
+
+    return await asyncio.gather(*(run(aw) for aw in aws))
+
+
+async def fetch_all(
+    endpoints: List[str],
+    on_result: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+    limit: Optional[int] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Request each distinct endpoint once, at most `limit` at a time.
+
+    `limit` is capped by fanout_limit(). `on_result` is awaited with each
+    endpoint and its response as soon as it arrives. Returns the responses
+    keyed by endpoint.
+    """
+    semaphore = asyncio.Semaphore(fanout_limit(limit))
+    results: Dict[str, Dict[str, Any]] = {}
+
+    async def fetch(endpoint: str) -> Tuple[str, Dict[str, Any]]:
+        async with semaphore:
+            return endpoint, await make_opendota_request(endpoint)
+
+    tasks = [asyncio.ensure_future(fetch(e)) for e in dict.fromkeys(endpoints)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            endpoint, data = await next_done
+            results[endpoint] = data
+            if on_result is not None:
+                await on_result(endpoint, data)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return results
+
+
+async def report_progress(
+    ctx: Optional[Context], progress: float, total: float, message: str
+):
+    """Send an MCP progress notification, ignoring clients that can't receive it."""
+    if ctx is None:
+        return
+    try:
+        await ctx.report_progress(progress, total, message)
+    except Exception as e:
+        logger.debug(f"Could not report progress: {e}")
 
 
 def get_cache_key(endpoint: str, params: Optional[Dict[str, Any]] = None) -> str:
@@ -126,73 +563,1882 @@ def get_cache_key(endpoint: str, params: Optional[Dict[str, Any]] = None) -> str
     return endpoint
 
 
-# Cache for API responses (simple in-memory cache)
-api_cache = {}
-CACHE_TTL = 300  # 5 minutes in seconds
+# Cache for API responses
+CACHE_TTL = 300  # Default TTL, 5 minutes in seconds
+CACHE_MAX_ENTRIES = int(os.getenv("OPENDOTA_CACHE_MAX_ENTRIES", "1000"))
+CACHE_MAX_BYTES = int(os.getenv("OPENDOTA_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Expired entries younger than this are served immediately while a background
+# request refreshes them; 0 disables stale-while-revalidate.
+CACHE_MAX_STALENESS = float(os.getenv("OPENDOTA_CACHE_MAX_STALENESS", "300"))
+CACHE_SWEEP_INTERVAL = 60.0  # Longest the sweeper sleeps between passes
+
+# Large entries (heroStats, proPlayers, whole match documents) are held
+# compressed in memory and decompressed on each hit. "auto" prefers zstd
+# when the zstandard package is installed and falls back to zlib.
+CACHE_COMPRESSION = os.getenv("OPENDOTA_CACHE_COMPRESSION", "auto").lower()
+CACHE_COMPRESS_MIN_BYTES = int(
+    os.getenv("OPENDOTA_CACHE_COMPRESS_MIN_BYTES", str(32 * 1024))
+)
+
+# Negative caching: not-found responses are remembered briefly, and an
+# endpoint that keeps failing with 5xx is held down instead of re-requested.
+NEGATIVE_CACHE_TTL = float(os.getenv("OPENDOTA_NEGATIVE_CACHE_TTL", "60"))
+SERVER_ERROR_HOLD_DOWN = float(os.getenv("OPENDOTA_SERVER_ERROR_HOLD_DOWN", "30"))
+SERVER_ERROR_THRESHOLD = 3  # Consecutive 5xx responses before holding down
+
+# Cache TTL per endpoint as (pattern, seconds) pairs. The first pattern that
+# fully matches the endpoint wins, None means the response never expires and
+# 0 means it is not cached. Endpoints without a match use CACHE_TTL.
+CACHE_TTL_POLICY: List[Tuple[str, Optional[float]]] = [
+    # Finished matches never change
+    (r"matches/\d+", None),
+    # Static reference data
+    (r"heroes", 24 * 3600),
+    (r"constants/.+", 24 * 3600),
+    # Aggregates that move slowly
+    (r"heroStats", 3600),
+    (r"proPlayers", 3600),
+    (r"teams/\d+(/players)?", 3600),
+    (r"players/\d+/(heroes|peers|totals|rankings|wordcloud)", 1800),
+    (r"search", 600),
+    # Synced into the match history store, which keeps it instead
+    (r"players/\d+/matches", 0),
+    # Volatile feeds
+    (r"players/\d+/recentMatches", 60),
+    (r"proMatches", 60),
+    (r"publicMatches", 30),
+    (r"health", 0),
+]
+
+
+def parse_ttl_overrides(value: str) -> List[Tuple[str, Optional[float]]]:
+    """Parse "pattern=seconds" pairs separated by commas.
+
+    Seconds may be "forever" for responses that never expire.
+    """
+    overrides = []
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        pattern, _, ttl = item.strip().rpartition("=")
+        if not pattern:
+            logger.warning(f"Ignoring malformed cache TTL override: {item!r}")
+            continue
+        try:
+            seconds = None if ttl.lower() == "forever" else float(ttl)
+        except ValueError:
+            logger.warning(f"Ignoring malformed cache TTL override: {item!r}")
+            continue
+        overrides.append((pattern, seconds))
+    return overrides
+
+
+_ttl_policy: List[Tuple[Pattern[str], Optional[float]]] = [
+    (re.compile(pattern), ttl)
+    for pattern, ttl in parse_ttl_overrides(os.getenv("OPENDOTA_CACHE_TTLS", ""))
+    + CACHE_TTL_POLICY
+]
+
+
+def get_cache_ttl(endpoint: str) -> Optional[float]:
+    """Return the cache TTL in seconds for an endpoint, or None for no expiry."""
+    for pattern, ttl in _ttl_policy:
+        if pattern.fullmatch(endpoint):
+            return ttl
+    return CACHE_TTL
+
+
+# Match document fields read by the tools. Parsed matches are dominated by
+# per-minute series, chat, objectives and teamfights that nothing uses.
+MATCH_FIELDS = (
+    "match_id",
+    "duration",
+    "start_time",
+    "game_mode",
+    "lobby_type",
+    "region",
+    "leagueid",
+    "series_id",
+    "series_type",
+    "radiant_win",
+    "radiant_score",
+    "dire_score",
+    "radiant_team",
+    "dire_team",
+    "players",
+)
+MATCH_PLAYER_FIELDS = (
+    "account_id",
+    "player_slot",
+    "hero_id",
+    "hero_name",
+    "personaname",
+    "name",
+    "kills",
+    "deaths",
+    "assists",
+    "last_hits",
+    "denies",
+    "gold_per_min",
+    "xp_per_min",
+    "net_worth",
+    "level",
+)
+# Cache match documents as returned instead of projecting them
+CACHE_FULL_DOCUMENTS = os.getenv("OPENDOTA_CACHE_FULL_DOCUMENTS", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+
+def project_match(match: Any) -> Any:
+    """Trim a match document down to MATCH_FIELDS and MATCH_PLAYER_FIELDS."""
+    if not isinstance(match, dict) or "match_id" not in match:
+        return match
+    projected = {key: match[key] for key in MATCH_FIELDS if key in match}
+    if isinstance(match.get("players"), list):
+        projected["players"] = [
+            (
+                {key: player[key] for key in MATCH_PLAYER_FIELDS if key in player}
+                if isinstance(player, dict)
+                else player
+            )
+            for player in match["players"]
+        ]
+    return projected
+
+
+# Projections applied to responses before they are cached, as (pattern,
+# function) pairs. The first pattern that fully matches the endpoint wins.
+CACHE_PROJECTIONS: List[Tuple[str, Callable[[Any], Any]]] = [
+    (r"matches/\d+", project_match),
+]
+
+_projections: List[Tuple[Pattern[str], Callable[[Any], Any]]] = [
+    (re.compile(pattern), project) for pattern, project in CACHE_PROJECTIONS
+]
+
+
+def get_projection(endpoint: str) -> Optional[Callable[[Any], Any]]:
+    """Return the projection for an endpoint, or None to cache it whole."""
+    if CACHE_FULL_DOCUMENTS:
+        return None
+    for pattern, project in _projections:
+        if pattern.fullmatch(endpoint):
+            return project
+    return None
+
+
+def decode_response(endpoint: str, body: bytes) -> Tuple[Any, bytes]:
+    """Decode a response body and apply the endpoint's projection.
+
+    Returns the data and the body to cache for it, which is re-encoded when
+    a projection trimmed the data.
+    """
+    data = json_loads(body)
+    project = get_projection(endpoint)
+    if project is not None:
+        data = project(data)
+        body = encode_json(data)
+    return data, body
+
+
+# Cache hit/miss/eviction counters, plus compression totals
+cache_metrics: Counter = Counter()
+
+
+@dataclass(frozen=True)
+class CompressionCodec:
+    """A named pair of compress/decompress functions."""
+
+    name: str
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+def load_compression_codec(name: str = "auto") -> Optional[CompressionCodec]:
+    """Return the cache compression codec, or None when compression is off.
+
+    Falls back to zlib when zstd is requested but zstandard isn't installed.
+    """
+    if name in ("none", "off", "0", ""):
+        return None
+    if name in ("auto", "zstd"):
+        try:
+            import zstandard
+        except ImportError:
+            if name == "zstd":
+                logger.warning("zstandard is not installed, compressing with zlib")
+        else:
+            return CompressionCodec(
+                "zstd",
+                zstandard.ZstdCompressor(level=3).compress,
+                zstandard.ZstdDecompressor().decompress,
+            )
+    elif name != "zlib":
+        logger.warning(f"Cache compression {name!r} is not available, using zlib")
+    return CompressionCodec(
+        "zlib", lambda body: zlib.compress(body, 6), zlib.decompress
+    )
+
+
+cache_codec = load_compression_codec(CACHE_COMPRESSION)
+
+
+@dataclass
+class CacheEntry:
+    """A cached API response and its approximate size in bytes.
+
+    Entries with a non-200 status are negative entries holding the error
+    returned for a failed request. ETag and Last-Modified validators are kept
+    so an expired entry can be revalidated instead of downloaded again.
+    Compressed entries hold the encoded response in `payload` and decode it
+    each time `data` is read.
+    """
+
+    payload: Any
+    stored_at: float
+    expires_at: float
+    size: int
+    status: int = 200
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    codec: Optional[CompressionCodec] = None
+
+    @property
+    def data(self) -> Any:
+        """The cached response, decompressed if needed."""
+        if self.codec is None:
+            return self.payload
+        started = time.perf_counter()
+        data = json_loads(self.codec.decompress(self.payload))
+        cache_metrics["decompressions"] += 1
+        cache_metrics["decompress_seconds"] += time.perf_counter() - started
+        return data
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        """Check whether the entry is still within its TTL."""
+        return (now if now is not None else time.time()) < self.expires_at
+
+    @property
+    def evict_at(self) -> float:
+        """Time after which the entry is too stale to serve.
+
+        Negative entries are never served stale.
+        """
+        if self.status != 200:
+            return self.expires_at
+        return self.expires_at + CACHE_MAX_STALENESS
+
+    def is_servable_stale(self, now: Optional[float] = None) -> bool:
+        """Check whether an expired entry may still be served while refreshing."""
+        return (now if now is not None else time.time()) < self.evict_at
+
+
+class ResponseCache:
+    """Bounded in-memory LRU cache for API responses.
+
+    Entries are evicted least recently used first once either the entry
+    count or the approximate byte budget is exceeded. Lookups and inserts
+    are O(1). Expiry times are kept in a min-heap so purge_expired() only
+    touches entries that are actually due, in O(log n) each. Responses whose
+    encoded body is at least `compress_min_bytes` are stored compressed.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        codec: Optional[CompressionCodec] = None,
+        compress_min_bytes: int = CACHE_COMPRESS_MIN_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.codec = codec
+        self.compress_min_bytes = compress_min_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        # (evict_at, key) pairs; replaced or evicted entries leave stale pairs
+        # behind that are skipped when popped.
+        self._expiry_heap: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Look up an entry and mark it as most recently used."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(
+        self,
+        key: str,
+        data: Any,
+        size: int,
+        ttl: Optional[float] = CACHE_TTL,
+        status: int = 200,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        body: Optional[bytes] = None,
+    ):
+        """Store an entry for `ttl` seconds (None for no expiry).
+
+        `body` is the encoded form of `data`; when given and large enough it
+        is compressed and stored in place of `data`. Least recently used
+        entries are evicted to make room.
+        """
+        self.pop(key)
+        if ttl == 0:
+            return
+
+        payload, codec = data, None
+        if (
+            self.codec is not None
+            and body is not None
+            and len(body) >= self.compress_min_bytes
+        ):
+            started = time.perf_counter()
+            payload, codec = self.codec.compress(body), self.codec
+            cache_metrics["compressions"] += 1
+            cache_metrics["compress_seconds"] += time.perf_counter() - started
+            cache_metrics["compressed_bytes_in"] += len(body)
+            cache_metrics["compressed_bytes_out"] += len(payload)
+            size = len(payload)
+
+        if size > self.max_bytes:
+            logger.debug(f"Not caching {key}: {size} bytes exceeds the cache budget")
+            return
+
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else math.inf
+        entry = CacheEntry(
+            payload=payload,
+            stored_at=now,
+            expires_at=expires_at,
+            size=size,
+            status=status,
+            etag=etag,
+            last_modified=last_modified,
+            codec=codec,
+        )
+        self._entries[key] = entry
+        self.total_bytes += size
+        self._index_expiry(key, entry)
+
+        while (
+            len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted.size
+            cache_metrics["evictions"] += 1
+
+    def refresh(
+        self,
+        key: str,
+        ttl: Optional[float],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> Optional[CacheEntry]:
+        """Extend a revalidated entry's TTL without replacing its data."""
+        entry = self.get(key)
+        if entry is None:
+            return None
+        entry.expires_at = time.time() + ttl if ttl is not None else math.inf
+        entry.etag = etag or entry.etag
+        entry.last_modified = last_modified or entry.last_modified
+        self._index_expiry(key, entry)
+        return entry
+
+    def pop(self, key: str) -> Optional[CacheEntry]:
+        """Remove an entry, returning it if it was cached."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+        return entry
+
+    def _index_expiry(self, key: str, entry: CacheEntry):
+        """Record when an entry becomes too stale to serve."""
+        if entry.evict_at < math.inf:
+            heapq.heappush(self._expiry_heap, (entry.evict_at, key))
+            if len(self._expiry_heap) > 2 * len(self._entries) + 64:
+                self._rebuild_expiry_heap()
+
+    def _is_current(self, evict_at: float, key: str) -> bool:
+        """Check whether a heap pair still describes the cached entry."""
+        entry = self._entries.get(key)
+        return entry is not None and entry.evict_at == evict_at
+
+    def _rebuild_expiry_heap(self):
+        """Drop stale heap pairs left behind by replaced or evicted entries."""
+        self._expiry_heap = [
+            (entry.evict_at, key)
+            for key, entry in self._entries.items()
+            if entry.evict_at < math.inf
+        ]
+        heapq.heapify(self._expiry_heap)
+
+    def next_expiry(self) -> Optional[float]:
+        """Return when the next entry becomes too stale to serve, if any."""
+        heap = self._expiry_heap
+        while heap and not self._is_current(*heap[0]):
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def purge_expired(self) -> int:
+        """Remove entries too stale to serve, returning how many were removed."""
+        now = time.time()
+        heap = self._expiry_heap
+        removed = 0
+        while heap and heap[0][0] <= now:
+            evict_at, key = heapq.heappop(heap)
+            if self._is_current(evict_at, key):
+                self.pop(key)
+                removed += 1
+        return removed
+
+    def clear(self):
+        """Remove every entry."""
+        self._entries.clear()
+        self._expiry_heap.clear()
+        self.total_bytes = 0
+
+
+api_cache = ResponseCache(
+    CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, cache_codec, CACHE_COMPRESS_MIN_BYTES
+)
+
+
+def get_cache_metrics() -> Dict[str, Any]:
+    """Return cache counters along with current size and compression stats."""
+    metrics: Dict[str, Any] = dict(cache_metrics)
+    metrics["entries"] = len(api_cache)
+    metrics["bytes"] = api_cache.total_bytes
+    metrics["codec"] = api_cache.codec.name if api_cache.codec else None
+    if cache_metrics["compressed_bytes_out"]:
+        metrics["compression_ratio"] = (
+            cache_metrics["compressed_bytes_in"] / cache_metrics["compressed_bytes_out"]
+        )
+    if cache_metrics["compressions"]:
+        metrics["avg_compress_ms"] = (
+            cache_metrics["compress_seconds"] / cache_metrics["compressions"] * 1000
+        )
+    if cache_metrics["decompressions"]:
+        metrics["avg_decompress_ms"] = (
+            cache_metrics["decompress_seconds"] / cache_metrics["decompressions"] * 1000
+        )
+    return metrics
+
+
+# Persistent response cache settings
+DISK_CACHE_PATH = os.getenv("OPENDOTA_DISK_CACHE_PATH", "")
+DISK_CACHE_MAX_BYTES = int(
+    os.getenv("OPENDOTA_DISK_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+)
+DISK_CACHE_COMPACT_EVERY = 200  # Writes between compactions
+DISK_CACHE_RETAIN_EXPIRED = 24 * 3600  # Keep expired rows this long to revalidate
+
+
+@dataclass
+class StoredResponse:
+    """A response body read back from the persistent cache."""
+
+    body: bytes
+    expires_at: Optional[float]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def is_fresh(self) -> bool:
+        """Check whether the stored response is still within its TTL."""
+        return self.expires_at is None or time.time() < self.expires_at
+
+
+class DiskCache:
+    """SQLite-backed response cache that survives server restarts.
+
+    Response bodies are stored as raw JSON bytes in a WAL-mode database so
+    readers never block the writer. Expired rows are kept for a while so
+    their validators can be used to revalidate them; compact() removes them
+    after that, along with the least recently used rows once the byte budget
+    is exceeded. Methods are blocking and meant to be run via
+    asyncio.to_thread.
+    """
+
+    SCHEMA_VERSION = 2
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes_since_compact = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # The table only holds cached data, so an outdated schema is
+            # simply dropped rather than migrated.
+            if conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS responses")
+                conn.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " body BLOB NOT NULL,"
+                " stored_at REAL NOT NULL,"
+                " expires_at REAL,"
+                " accessed_at REAL NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " etag TEXT,"
+                " last_modified TEXT)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at"
+                " ON responses (accessed_at)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        """Return the stored response for a key, which may have expired."""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT body, expires_at, etag, last_modified FROM responses"
+                " WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+        if row is None:
+            return None
+        return StoredResponse(bytes(row[0]), row[1], row[2], row[3])
+
+    def put(
+        self,
+        key: str,
+        body: bytes,
+        ttl: Optional[float],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        """Store a response body for `ttl` seconds (None for no expiry)."""
+        if ttl == 0 or len(body) > self.max_bytes:
+            return
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO responses (key, body, stored_at, expires_at,"
+                " accessed_at, size, etag, last_modified)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, body, now, expires_at, now, len(body), etag, last_modified),
+            )
+            self._writes_since_compact += 1
+            should_compact = self._writes_since_compact >= DISK_CACHE_COMPACT_EVERY
+        if should_compact:
+            self.compact()
+
+    def touch(
+        self,
+        key: str,
+        ttl: Optional[float],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        """Extend a revalidated entry's expiry, keeping its body."""
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._connect().execute(
+                "UPDATE responses SET expires_at = ?, accessed_at = ?,"
+                " etag = COALESCE(?, etag),"
+                " last_modified = COALESCE(?, last_modified)"
+                " WHERE key = ?",
+                (expires_at, now, etag, last_modified, key),
+            )
+
+    def compact(self) -> int:
+        """Drop long-expired and over-budget entries, returning the number removed."""
+        with self._lock:
+            conn = self._connect()
+            self._writes_since_compact = 0
+            removed = conn.execute(
+                "DELETE FROM responses WHERE expires_at <= ?",
+                (time.time() - DISK_CACHE_RETAIN_EXPIRED,),
+            ).rowcount
+
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            if total > self.max_bytes:
+                # Walk entries from least to most recently used until enough
+                # space is freed, then delete them in one statement.
+                excess = total - self.max_bytes
+                cutoff = None
+                for accessed_at, size in conn.execute(
+                    "SELECT accessed_at, size FROM responses ORDER BY accessed_at"
+                ):
+                    excess -= size
+                    cutoff = accessed_at
+                    if excess <= 0:
+                        break
+                removed += conn.execute(
+                    "DELETE FROM responses WHERE accessed_at <= ?", (cutoff,)
+                ).rowcount
+
+            conn.execute("PRAGMA incremental_vacuum")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if removed:
+            logger.info(f"Disk cache compaction: removed {removed} entries")
+        return removed
+
+    def close(self):
+        """Compact and close the database."""
+        if self._conn is None:
+            return
+        self.compact()
+        with self._lock:
+            self._conn.close()
+            self._conn = None
+
+
+disk_cache: Optional[DiskCache] = (
+    DiskCache(DISK_CACHE_PATH, DISK_CACHE_MAX_BYTES) if DISK_CACHE_PATH else None
+)
+
+
+def default_match_history_path() -> str:
+    """Where match histories are kept when no path is configured.
+
+    Beside the persistent response cache when there is one, otherwise in the
+    user's cache directory.
+    """
+    if DISK_CACHE_PATH:
+        directory = os.path.dirname(os.path.abspath(DISK_CACHE_PATH))
+    else:
+        directory = os.path.join(
+            os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+            "opendota-mcp-server",
+        )
+    return os.path.join(directory, "match_history.db")
+
+
+# Player match histories persist across sessions; ":memory:" opts out
+MATCH_HISTORY_PATH = (
+    os.getenv("OPENDOTA_MATCH_HISTORY_PATH") or default_match_history_path()
+)
+MATCH_HISTORY_SYNC_INTERVAL = float(
+    os.getenv("OPENDOTA_MATCH_HISTORY_SYNC_INTERVAL", "300")
+)
+
+# Columns requested from players/{id}/matches and stored per match
+MATCH_HISTORY_FIELDS = (
+    "match_id",
+    "start_time",
+    "duration",
+    "hero_id",
+    "player_slot",
+    "radiant_win",
+    "kills",
+    "deaths",
+    "assists",
+    "game_mode",
+    "lobby_type",
+)
+
+
+class MatchHistoryStore:
+    """SQLite store of player match histories, synced incrementally.
+
+    Each player's history is downloaded in full once and then extended with
+    only the matches played since the newest stored one, so questions about
+    a player's history are answered locally. Methods are blocking and meant
+    to be run via asyncio.to_thread.
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        return sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            try:
+                conn = self._open()
+                conn.execute("PRAGMA journal_mode=WAL")
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(
+                    f"Could not open match history {self.path}, keeping it in "
+                    f"memory: {e}"
+                )
+                self.path = ":memory:"
+                conn = self._open()
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Histories can always be downloaded again, so an outdated schema
+            # is dropped rather than migrated.
+            if conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS player_matches")
+                conn.execute("DROP TABLE IF EXISTS player_syncs")
+                conn.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS player_matches ("
+                " account_id INTEGER NOT NULL,"
+                " match_id INTEGER NOT NULL,"
+                " start_time INTEGER,"
+                " duration INTEGER,"
+                " hero_id INTEGER,"
+                " player_slot INTEGER,"
+                " win INTEGER NOT NULL,"
+                " kills INTEGER,"
+                " deaths INTEGER,"
+                " assists INTEGER,"
+                " game_mode INTEGER,"
+                " lobby_type INTEGER,"
+                " PRIMARY KEY (account_id, match_id)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS player_syncs ("
+                " account_id INTEGER PRIMARY KEY,"
+                " synced_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def sync_state(self, account_id: int) -> Optional[Tuple[float, int, int]]:
+        """Return (synced_at, newest match_id, newest start_time) for a player.
+
+        Returns None for players whose history has never been synced; the
+        match ID and start time are 0 when the synced history is empty.
+        """
+        with self._lock:
+            conn = self._connect()
+            synced = conn.execute(
+                "SELECT synced_at FROM player_syncs WHERE account_id = ?",
+                (account_id,),
+            ).fetchone()
+            if synced is None:
+                return None
+            newest = conn.execute(
+                "SELECT COALESCE(MAX(match_id), 0), COALESCE(MAX(start_time), 0)"
+                " FROM player_matches WHERE account_id = ?",
+                (account_id,),
+            ).fetchone()
+        return synced[0], newest[0], newest[1]
+
+    def add(self, account_id: int, matches: List[Dict[str, Any]]) -> int:
+        """Store a player's matches and mark them synced, returning how many are new."""
+        rows = [
+            (
+                account_id,
+                match["match_id"],
+                match.get("start_time"),
+                match.get("duration"),
+                match.get("hero_id"),
+                match.get("player_slot"),
+                int(match.get("radiant_win") == (match.get("player_slot", 0) < 128)),
+                match.get("kills"),
+                match.get("deaths"),
+                match.get("assists"),
+                match.get("game_mode"),
+                match.get("lobby_type"),
+            )
+            for match in matches
+            if isinstance(match, dict) and match.get("match_id") is not None
+        ]
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT OR IGNORE INTO player_matches VALUES"
+                    " (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                added = conn.total_changes - before
+                conn.execute(
+                    "INSERT OR REPLACE INTO player_syncs (account_id, synced_at)"
+                    " VALUES (?, ?)",
+                    (account_id, time.time()),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def recent(
+        self, account_id: int, hero_id: Optional[int] = None, limit: int = 10
+    ) -> List[sqlite3.Row]:
+        """Return a player's newest stored matches, optionally for one hero."""
+        query = "SELECT * FROM player_matches WHERE account_id = ?"
+        args: List[Any] = [account_id]
+        if hero_id is not None:
+            query += " AND hero_id = ?"
+            args.append(hero_id)
+        query += " ORDER BY match_id DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            cursor = self._connect().execute(query, args)
+            cursor.row_factory = sqlite3.Row
+            return cursor.fetchall()
+
+    def totals(
+        self, account_id: int, hero_id: Optional[int] = None
+    ) -> Tuple[int, int, float, float, float, Optional[int], Optional[int]]:
+        """Aggregate a player's stored matches, optionally for one hero.
+
+        Returns (games, wins, average kills, average deaths, average assists,
+        first start_time, last start_time).
+        """
+        query = (
+            "SELECT COUNT(*), COALESCE(SUM(win), 0), COALESCE(AVG(kills), 0),"
+            " COALESCE(AVG(deaths), 0), COALESCE(AVG(assists), 0),"
+            " MIN(start_time), MAX(start_time)"
+            " FROM player_matches WHERE account_id = ?"
+        )
+        args: List[Any] = [account_id]
+        if hero_id is not None:
+            query += " AND hero_id = ?"
+            args.append(hero_id)
+        with self._lock:
+            return self._connect().execute(query, args).fetchone()
+
+    def heroes(self, account_id: int, limit: int = 5) -> List[Tuple[int, int, int]]:
+        """Return (hero_id, games, wins) for a player's most played heroes."""
+        with self._lock:
+            cursor = self._connect().execute(
+                "SELECT hero_id, COUNT(*) AS games, SUM(win) FROM player_matches"
+                " WHERE account_id = ? GROUP BY hero_id"
+                " ORDER BY games DESC, hero_id LIMIT ?",
+                (account_id, limit),
+            )
+            return cursor.fetchall()
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+match_history = MatchHistoryStore(MATCH_HISTORY_PATH)
+
+
+# Strong references to fire-and-forget tasks so they aren't garbage collected
+_background_tasks: "set[asyncio.Task[Any]]" = set()
+
+
+def spawn_background(coro: Coroutine[Any, Any, Any]) -> "asyncio.Task[Any]":
+    """Run a coroutine in the background without waiting for it."""
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _disk_cache_get(key: str) -> Optional[StoredResponse]:
+    """Read an entry from the persistent cache, treating errors as misses."""
+    if disk_cache is None:
+        return None
+    try:
+        return await asyncio.to_thread(disk_cache.get, key)
+    except sqlite3.Error as e:
+        logger.warning(f"Disk cache read failed for {key}: {e}")
+        return None
+
+
+async def _disk_cache_write(method: str, key: str, *args: Any):
+    """Write to the persistent cache, logging rather than raising on errors."""
+    if disk_cache is None:
+        return
+    try:
+        await asyncio.to_thread(getattr(disk_cache, method), key, *args)
+    except sqlite3.Error as e:
+        logger.warning(f"Disk cache write failed for {key}: {e}")
+
+
+# Consecutive 5xx responses per cache key, with the time of the latest. A
+# streak older than the hold-down is forgotten and swept by cleanup_cache.
+_server_error_counts: Dict[str, Tuple[int, float]] = {}
+
+# Upstream requests currently in flight, keyed by cache key
+_inflight_requests: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+
+# Responses fetched up front for the batch running in the current context,
+# keyed by endpoint. Tools in the batch read these instead of going upstream.
+_batch_responses: ContextVar[Optional[Dict[str, Dict[str, Any]]]] = ContextVar(
+    "batch_responses", default=None
+)
 
 
 async def make_opendota_request(
     endpoint: str, params: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
-    """Make a request to the OpenDota API with proper error handling and caching."""
-    # Apply rate limiting
-    await apply_rate_limit()
+    """Make a request to the OpenDota API with proper error handling and caching.
+
+    Concurrent callers asking for the same resource share a single upstream
+    request instead of each missing the cache and fetching it again. Recently
+    expired entries are returned immediately while they refresh in the
+    background. Inside run_batch, responses the batch prefetched are returned
+    without consulting the cache.
+    """
+    prefetched = _batch_responses.get()
+    if prefetched is not None and not params and endpoint in prefetched:
+        return prefetched[endpoint]
 
-    url = f"{OPENDOTA_API_BASE}/{endpoint}"
     request_params = API_PARAMS.copy()
     if params:
         request_params.update(params)
 
-    # Create a cache key manually
-    cache_key = endpoint
-    if request_params:
-        param_str = "&".join(f"{k}={v}" for k, v in sorted(request_params.items()))
-        cache_key = f"{endpoint}?{param_str}"
+    cache_key = get_cache_key(endpoint, request_params)
 
     # Check cache
     cache_entry = api_cache.get(cache_key)
     if cache_entry:
-        timestamp, data = cache_entry
-        if time.time() - timestamp < CACHE_TTL:
+        now = time.time()
+        if cache_entry.is_fresh(now):
             logger.debug(f"Cache hit for {cache_key}")
+            if cache_entry.status >= 500:
+                cache_metrics["hold_down_hits"] += 1
+            elif cache_entry.status != 200:
+                cache_metrics["negative_hits"] += 1
+            else:
+                cache_metrics["hits"] += 1
+            return cache_entry.data
+        if cache_entry.is_servable_stale(now):
+            logger.debug(f"Serving stale {cache_key} while refreshing")
+            cache_metrics["stale_hits"] += 1
+            _start_fetch(endpoint, request_params, cache_key)
+            return cache_entry.data
+    cache_metrics["misses"] += 1
+
+    # Shield the shared fetch so a cancelled caller doesn't cancel it for the
+    # other callers waiting on the same result.
+    return await asyncio.shield(_start_fetch(endpoint, request_params, cache_key))
+
+
+def _start_fetch(
+    endpoint: str, request_params: Dict[str, Any], cache_key: str
+) -> "asyncio.Task[Dict[str, Any]]":
+    """Return the in-flight fetch for a cache key, starting one if needed."""
+    task = _inflight_requests.get(cache_key)
+    if task is not None:
+        logger.debug(f"Joining in-flight request for {cache_key}")
+        return task
+
+    task = asyncio.ensure_future(_fetch_opendota(endpoint, request_params, cache_key))
+    _inflight_requests[cache_key] = task
+
+    def _forget(done: "asyncio.Task[Dict[str, Any]]") -> None:
+        if _inflight_requests.get(cache_key) is done:
+            del _inflight_requests[cache_key]
+
+    task.add_done_callback(_forget)
+    return task
+
+
+async def _fetch_opendota(
+    endpoint: str, request_params: Dict[str, Any], cache_key: str
+) -> Dict[str, Any]:
+    """Fetch an endpoint from the OpenDota API and cache a successful response.
+
+    The persistent cache, when enabled, is consulted before going upstream.
+    Expired responses with an ETag or Last-Modified validator are revalidated
+    with a conditional request, and a 304 just extends their TTL.
+    """
+    # Expired response to revalidate: (memory entry, disk body, etag,
+    # last_modified), with exactly one of the entry and the body set
+    stale: Optional[
+        Tuple[Optional[CacheEntry], Optional[bytes], Optional[str], Optional[str]]
+    ] = None
+
+    memory_entry = api_cache.get(cache_key)
+    if memory_entry is not None and memory_entry.status == 200:
+        # The data is only decoded if the upstream confirms it is unchanged
+        stale = (memory_entry, None, memory_entry.etag, memory_entry.last_modified)
+    else:
+        stored = await _disk_cache_get(cache_key)
+        if stored is not None and stored.is_fresh():
+            logger.debug(f"Disk cache hit for {cache_key}")
+            cache_metrics["disk_hits"] += 1
+            data, body = decode_response(endpoint, stored.body)
+            index_player_names(endpoint, data)
+            ttl = (
+                stored.expires_at - time.time()
+                if stored.expires_at is not None
+                else None
+            )
+            api_cache.put(
+                cache_key,
+                data,
+                len(body),
+                ttl,
+                etag=stored.etag,
+                last_modified=stored.last_modified,
+                body=body,
+            )
             return data
+        if stored is not None:
+            stale = (None, stored.body, stored.etag, stored.last_modified)
+
+    headers = {}
+    if stale is not None:
+        _, _, etag, last_modified = stale
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    route = get_endpoint_route(endpoint)
+    if not circuit_breaker.allow(route):
+        logger.warning(f"Circuit open for {route}, not requesting {endpoint}")
+        cache_metrics["circuit_open"] += 1
+        return {"error": "OpenDota API is unavailable. Please try again later."}
 
     logger.info(f"Making request to {endpoint} with params {request_params}")
 
-    async with httpx.AsyncClient() as client:
+    try:
+        response = await _get_with_retries(endpoint, request_params, headers)
+        if response is None:
+            return {"error": RATE_LIMIT_MESSAGE}
+        if response.status_code >= 500:
+            circuit_breaker.record_failure(route)
+        elif response.status_code != 429:
+            circuit_breaker.record_success(route)
+
+        ttl = get_cache_ttl(endpoint)
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+
+        if response.status_code == 304 and stale is not None:
+            logger.debug(f"Revalidated {cache_key}")
+            cache_metrics["revalidated"] += 1
+            _server_error_counts.pop(cache_key, None)
+            stale_entry, body, stale_etag, stale_last_modified = stale
+            etag = etag or stale_etag
+            last_modified = last_modified or stale_last_modified
+            if body is not None:
+                data, body = decode_response(endpoint, body)
+                index_player_names(endpoint, data)
+                api_cache.put(
+                    cache_key,
+                    data,
+                    len(body),
+                    ttl,
+                    etag=etag,
+                    last_modified=last_modified,
+                    body=body,
+                )
+            else:
+                data = stale_entry.data
+                api_cache.refresh(cache_key, ttl, etag, last_modified)
+            if disk_cache is not None:
+                spawn_background(
+                    _disk_cache_write("touch", cache_key, ttl, etag, last_modified)
+                )
+            return data
+
+        response.raise_for_status()
+        data, body = decode_response(endpoint, response.content)
+        index_player_names(endpoint, data)
+
+        # Cache the response
+        _server_error_counts.pop(cache_key, None)
+        api_cache.put(
+            cache_key,
+            data,
+            len(body),
+            ttl,
+            etag=etag,
+            last_modified=last_modified,
+            body=body,
+        )
+        if disk_cache is not None and ttl != 0:
+            spawn_background(
+                _disk_cache_write("put", cache_key, body, ttl, etag, last_modified)
+            )
+
+        return data
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 429:
+            logger.error(f"Rate limit exceeded for {endpoint}")
+            return {"error": RATE_LIMIT_MESSAGE}
+        if e.response.status_code in (404, 410):
+            logger.error(f"Resource not found: {endpoint}")
+            error = {"error": "Not found. The requested resource doesn't exist."}
+            api_cache.put(
+                cache_key,
+                error,
+                len(e.response.content),
+                NEGATIVE_CACHE_TTL,
+                status=e.response.status_code,
+            )
+            return error
+        if e.response.status_code >= 500:
+            logger.error(f"OpenDota API server error: {e.response.status_code}")
+            error = {"error": "OpenDota API server error. Please try again later."}
+            now = time.time()
+            failures, last_failure = _server_error_counts.get(cache_key, (0, now))
+            if now - last_failure > SERVER_ERROR_HOLD_DOWN:
+                failures = 0
+            failures += 1
+            _server_error_counts[cache_key] = (failures, now)
+
+            # A good response that is still servable is kept, not replaced
+            good = memory_entry
+            if good is not None and (
+                good.status != 200 or not good.is_servable_stale(now)
+            ):
+                good = None
+            if failures >= SERVER_ERROR_THRESHOLD:
+                logger.warning(
+                    f"Holding down {endpoint} for {SERVER_ERROR_HOLD_DOWN:.0f}s "
+                    f"after {failures} server errors"
+                )
+                if good is None or (
+                    api_cache.refresh(cache_key, SERVER_ERROR_HOLD_DOWN) is None
+                ):
+                    api_cache.put(
+                        cache_key,
+                        error,
+                        len(e.response.content),
+                        SERVER_ERROR_HOLD_DOWN,
+                        status=e.response.status_code,
+                    )
+            if good is not None:
+                return good.data
+            return error
+        logger.error(
+            f"HTTP error {e.response.status_code} for {endpoint}: {e.response.text}"
+        )
+        return {"error": f"HTTP error {e.response.status_code}: {e.response.text}"}
+    except httpx.TransportError as e:
+        circuit_breaker.record_failure(route)
+        logger.error(f"Request to {endpoint} failed after retries: {str(e)}")
+        return {"error": f"Unexpected error: {str(e)}"}
+    except Exception as e:
+        logger.error(f"Unexpected error for {endpoint}: {str(e)}")
+        return {"error": f"Unexpected error: {str(e)}"}
+
+
+async def _get_with_retries(
+    endpoint: str,
+    request_params: Dict[str, Any],
+    headers: Optional[Dict[str, str]] = None,
+) -> Optional[httpx.Response]:
+    """GET an endpoint, retrying timeouts, connection errors and transient statuses.
+
+    Every attempt goes through the rate limiter, which also absorbs any
+    Retry-After delay from a 429. Returns None when no rate limit budget is
+    left, and re-raises the transport error once retries are exhausted.
+    """
+    client = get_http_client()
+    attempt = 0
+    while True:
+        if not await rate_limiter.acquire():
+            return None
         try:
             response = await client.get(
-                url,
-                params=request_params,
-                headers={"User-Agent": USER_AGENT},
-                timeout=10.0,
+                endpoint, params=request_params, headers=headers
+            )
+        except httpx.TransportError as e:
+            if attempt >= MAX_RETRIES:
+                raise
+            logger.warning(f"Request to {endpoint} failed ({e!r}), retrying")
+        else:
+            rate_limiter.update_from_response(response)
+            if attempt >= MAX_RETRIES or not is_retryable(response):
+                return response
+            logger.warning(
+                f"OpenDota returned {response.status_code} for {endpoint}, retrying"
             )
-            response.raise_for_status()
-            data = response.json()
 
-            # Cache the response
-            api_cache[cache_key] = (time.time(), data)
+        cache_metrics["retries"] += 1
+        await asyncio.sleep(retry_delay(attempt))
+        attempt += 1
 
-            return data
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 429:
-                logger.error(f"Rate limit exceeded for {endpoint}")
-                return {
-                    "error": "Rate limit exceeded. Consider using an API key for more requests."
-                }
-            if e.response.status_code == 404:
-                logger.error(f"Resource not found: {endpoint}")
-                return {"error": "Not found. The requested resource doesn't exist."}
-            if e.response.status_code >= 500:
-                logger.error(f"OpenDota API server error: {e.response.status_code}")
-                return {"error": "OpenDota API server error. Please try again later."}
-            logger.error(
-                f"HTTP error {e.response.status_code} for {endpoint}: {e.response.text}"
+
+# Indexes derived from cached responses
+IndexT = TypeVar("IndexT")
+
+# Latest index per (endpoint, builder) as (stored_at of the source cache
+# entry, index). Entries are replaced whole, so readers holding an index
+# never see it change under them.
+_derived_indexes: Dict[Tuple[str, Callable[[Any], Any]], Tuple[float, Any]] = {}
+
+
+async def get_derived_index(
+    endpoint: str, build: Callable[[Any], IndexT]
+) -> Union[IndexT, Dict[str, Any]]:
+    """Fetch an endpoint and return an index built from its response.
+
+    The index is built once per cached copy of the response and reused until
+    the cache stores a new one; revalidated (304) responses keep their index.
+    While the cached copy is fresh its index is returned without decoding the
+    response at all. Returns the error dict when the request fails.
+    """
+    key = (endpoint, build)
+    cache_key = get_cache_key(endpoint, API_PARAMS)
+    cached = _derived_indexes.get(key)
+    entry = api_cache.get(cache_key)
+    if (
+        cached is not None
+        and entry is not None
+        and entry.status == 200
+        and entry.is_fresh()
+        and cached[0] == entry.stored_at
+    ):
+        cache_metrics["hits"] += 1
+        return cached[1]
+
+    data = await make_opendota_request(endpoint)
+    if isinstance(data, dict) and "error" in data:
+        return data
+
+    entry = api_cache.get(cache_key)
+    version = entry.stored_at if entry is not None and entry.status == 200 else None
+    if version is not None and cached is not None and cached[0] == version:
+        return cached[1]
+
+    index = build(data)
+    if version is not None:
+        _derived_indexes[key] = (version, index)
+    return index
+
+
+def normalize_name(name: str) -> str:
+    """Lower-case a name and strip everything but letters and digits."""
+    return "".join(ch for ch in name.lower() if ch.isalnum())
+
+
+class HeroIndex:
+    """Hero lookup tables built from the heroes endpoint.
+
+    Provides O(1) lookups by ID and by normalized localized or internal name,
+    with fuzzy matching for misspelled names.
+    """
+
+    def __init__(self, heroes: Any):
+        self.by_id: Dict[int, Dict[str, Any]] = {}
+        self._ids_by_name: Dict[str, int] = {}
+        if not isinstance(heroes, list):
+            return
+        for hero in sorted(
+            (h for h in heroes if isinstance(h, dict) and h.get("id") is not None),
+            key=lambda h: h["id"],
+        ):
+            self.by_id[hero["id"]] = hero
+            for name in (
+                hero.get("localized_name"),
+                (hero.get("name") or "").removeprefix("npc_dota_hero_"),
+            ):
+                if name:
+                    self._ids_by_name.setdefault(normalize_name(name), hero["id"])
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    @property
+    def heroes(self) -> List[Dict[str, Any]]:
+        """All heroes, ordered by ID."""
+        return list(self.by_id.values())
+
+    def get(self, hero_id: int) -> Optional[Dict[str, Any]]:
+        """Return the hero with an ID, if known."""
+        return self.by_id.get(hero_id)
+
+    def name(self, hero_id: Any) -> str:
+        """Return a hero's localized name, or a placeholder for unknown IDs."""
+        hero = self.by_id.get(hero_id)
+        if hero is not None and hero.get("localized_name"):
+            return hero["localized_name"]
+        return f"Hero {hero_id}"
+
+    def find(self, name: str, cutoff: float = 0.75) -> Optional[int]:
+        """Resolve a hero name to its ID, tolerating small misspellings."""
+        key = normalize_name(name)
+        if not key:
+            return None
+        if key in self._ids_by_name:
+            return self._ids_by_name[key]
+        matches = difflib.get_close_matches(key, self._ids_by_name, n=1, cutoff=cutoff)
+        return self._ids_by_name[matches[0]] if matches else None
+
+
+async def get_hero_index() -> HeroIndex:
+    """Return the current hero index.
+
+    Falls back to the heroes in the constants snapshot when the heroes
+    endpoint can't be fetched.
+    """
+    index = await get_derived_index("heroes", HeroIndex)
+    if isinstance(index, HeroIndex):
+        return index
+    logger.warning(f"Heroes unavailable, using constants snapshot: {index['error']}")
+    return get_constants().hero_index
+
+
+# Upstream constants endpoint behind each lookup table
+CONSTANTS_ENDPOINTS = {
+    "heroes": "constants/heroes",
+    "hero_names": "constants/heroes",
+    "game_mode": "constants/game_mode",
+    "lobby_type": "constants/lobby_type",
+    "region": "constants/region",
+}
+# Tables whose bundled labels read better than the upstream identifiers
+# (e.g. "All Draft" rather than game_mode_all_draft); upstream only adds IDs.
+CONSTANTS_PREFER_BUNDLED = {"game_mode", "lobby_type", "region"}
+
+
+class Constants:
+    """ID-to-name lookup tables for OpenDota constants.
+
+    Tables are plain dicts keyed by integer ID: heroes (localized names),
+    hero_names (internal npc_dota_hero_* names), game_mode, lobby_type and
+    region. Instances are never modified; a refresh builds a new
+    one and swaps it in.
+    """
+
+    def __init__(self, tables: Dict[str, Dict[int, str]], patch: str = ""):
+        self.tables = tables
+        self.patch = patch
+        self._hero_index: Optional[HeroIndex] = None
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any]) -> "Constants":
+        """Build the lookup tables from a bundled snapshot document."""
+        heroes = snapshot.get("heroes", {})
+        tables = {
+            "heroes": {int(k): v["localized_name"] for k, v in heroes.items()},
+            "hero_names": {int(k): v["name"] for k, v in heroes.items()},
+        }
+        for table in ("game_mode", "lobby_type", "region"):
+            tables[table] = {int(k): v for k, v in snapshot.get(table, {}).items()}
+        return cls(tables, snapshot.get("patch", ""))
+
+    def name(self, table: str, value: Any) -> Optional[str]:
+        """Look up the name for an ID, or None if it is unknown."""
+        return self.tables.get(table, {}).get(value)
+
+    def hero_name(self, hero_id: Any) -> str:
+        """Return a hero's localized name, or a placeholder for unknown IDs."""
+        return self.name("heroes", hero_id) or f"Hero {hero_id}"
+
+    def label(self, table: str, value: Any) -> str:
+        """Return the name for an ID, falling back to the raw value."""
+        name = self.name(table, value)
+        return name if name is not None else str(value)
+
+    @property
+    def hero_index(self) -> HeroIndex:
+        """A hero index built from the hero tables."""
+        if self._hero_index is None:
+            hero_names = self.tables.get("hero_names", {})
+            self._hero_index = HeroIndex(
+                [
+                    {
+                        "id": hero_id,
+                        "localized_name": name,
+                        "name": hero_names.get(hero_id),
+                    }
+                    for hero_id, name in self.tables.get("heroes", {}).items()
+                ]
             )
-            return {"error": f"HTTP error {e.response.status_code}: {e.response.text}"}
-        except Exception as e:
-            logger.error(f"Unexpected error for {endpoint}: {str(e)}")
-            return {"error": f"Unexpected error: {str(e)}"}
+        return self._hero_index
+
+
+def load_constants_snapshot(path: str = CONSTANTS_SNAPSHOT_PATH) -> Constants:
+    """Load the bundled constants snapshot, or empty tables if it is unusable."""
+    try:
+        with open(path, "rb") as f:
+            snapshot = json_loads(f.read())
+        if snapshot.get("version") != CONSTANTS_SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported snapshot version {snapshot.get('version')}")
+        return Constants.from_snapshot(snapshot)
+    except (OSError, ValueError, KeyError, AttributeError) as e:
+        logger.warning(f"Could not load constants snapshot {path}: {e}")
+        return Constants({})
+
+
+_constants: Optional[Constants] = None
+
+
+def get_constants() -> Constants:
+    """Return the current constants, loading the bundled snapshot on first use."""
+    global _constants
+
+    if _constants is None:
+        _constants = load_constants_snapshot()
+    return _constants
+
+
+def parse_constants(table: str, data: Any) -> Dict[int, str]:
+    """Convert an upstream constants payload into an ID-to-name table."""
+    parsed: Dict[int, str] = {}
+    if not isinstance(data, dict) or "error" in data:
+        return parsed
+    for key, value in data.items():
+        if table == "region":
+            if isinstance(value, str) and key.isdigit():
+                parsed[int(key)] = value
+            continue
+        if not isinstance(value, dict) or not isinstance(value.get("id"), int):
+            continue
+        if table == "heroes":
+            name = value.get("localized_name")
+        elif table == "hero_names":
+            name = value.get("name")
+        else:
+            words = str(value.get("name", "")).removeprefix(f"{table}_").split("_")
+            name = " ".join(word.capitalize() for word in words if word)
+        if name:
+            parsed[value["id"]] = name
+    return parsed
+
+
+async def refresh_constants() -> bool:
+    """Refresh the lookup tables from the upstream constants endpoints.
+
+    Tables whose endpoint fails keep their current contents. Returns whether
+    every endpoint was fetched.
+    """
+    global _constants
+
+    endpoints = sorted(set(CONSTANTS_ENDPOINTS.values()))
+    responses = dict(
+        zip(
+            endpoints,
+            await gather_bounded(*(make_opendota_request(e) for e in endpoints)),
+        )
+    )
+
+    current = get_constants()
+    tables = {}
+    for table, endpoint in CONSTANTS_ENDPOINTS.items():
+        upstream = parse_constants(table, responses[endpoint])
+        existing = current.tables.get(table, {})
+        if table in CONSTANTS_PREFER_BUNDLED:
+            tables[table] = {**upstream, **existing}
+        else:
+            tables[table] = {**existing, **upstream}
+    _constants = Constants(tables, current.patch)
+
+    failed = [
+        endpoint
+        for endpoint, response in responses.items()
+        if isinstance(response, dict) and "error" in response
+    ]
+    if failed:
+        logger.warning(f"Constants refresh incomplete, failed: {', '.join(failed)}")
+    else:
+        logger.info("Constants refreshed from OpenDota")
+    return not failed
+
+
+# Skill brackets in heroStats, numbered 1-8 in the field names
+HERO_BRACKETS = [
+    "herald",
+    "guardian",
+    "crusader",
+    "archon",
+    "legend",
+    "ancient",
+    "divine",
+    "immortal",
+]
+
+
+def _rates(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Element-wise percentage, 0 where the denominator is 0."""
+    return (
+        np.divide(
+            numerator,
+            denominator,
+            out=np.zeros(numerator.shape, dtype=np.float64),
+            where=denominator > 0,
+        )
+        * 100
+    )
+
+
+class HeroStatsTable:
+    """Columnar view of the heroStats payload.
+
+    Picks and wins per bracket are held as (heroes x 8) arrays alongside pro
+    picks, wins and bans, so win rates for every hero and bracket are
+    computed once, vectorized. Rows are found by hero ID in O(1).
+    """
+
+    def __init__(self, hero_stats: Any):
+        rows = [
+            hero
+            for hero in (hero_stats if isinstance(hero_stats, list) else [])
+            if isinstance(hero, dict)
+        ]
+        self.rows = rows
+        self.ids = [hero.get("id", hero.get("hero_id")) for hero in rows]
+        self.row_by_id: Dict[Any, int] = {}
+        for row, hero_id in enumerate(self.ids):
+            self.row_by_id.setdefault(hero_id, row)
+
+        def column(field_name: str) -> np.ndarray:
+            return np.array(
+                [hero.get(field_name) or 0 for hero in rows], dtype=np.int64
+            )
+
+        brackets = range(1, len(HERO_BRACKETS) + 1)
+        shape = (len(rows), len(HERO_BRACKETS))
+        self.picks = np.column_stack([column(f"{i}_pick") for i in brackets]).reshape(
+            shape
+        )
+        self.wins = np.column_stack([column(f"{i}_win") for i in brackets]).reshape(
+            shape
+        )
+        self.pro_picks = column("pro_pick")
+        self.pro_wins = column("pro_win")
+        self.pro_bans = column("pro_ban")
+
+        self.win_rates = _rates(self.wins, self.picks)
+        self.total_picks = self.picks.sum(axis=1)
+        self.total_wins = self.wins.sum(axis=1)
+        self.overall_win_rates = _rates(self.total_wins, self.total_picks)
+        self.pro_win_rates = _rates(self.pro_wins, self.pro_picks)
+
+        # Pick and ban rates as a share of matches, with ten picks per match
+        self.pick_rates = _rates(self.picks, self.picks.sum(axis=0) / 10)
+        self.overall_pick_rates = _rates(self.total_picks, self.total_picks.sum() / 10)
+        pro_matches = np.full(len(rows), self.pro_picks.sum() / 10)
+        self.pro_pick_rates = _rates(self.pro_picks, pro_matches)
+        self.pro_ban_rates = _rates(self.pro_bans, pro_matches)
+
+        # Summary order: by localized name, heroes without one first
+        self.name_order = sorted(
+            range(len(rows)), key=lambda row: rows[row].get("localized_name") or ""
+        )
+        self._summary: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def row(self, hero_id: Any) -> Optional[int]:
+        """Return the row index of a hero, if present."""
+        return self.row_by_id.get(hero_id)
+
+    def name(self, row: int) -> str:
+        """Return the localized name of the hero in a row."""
+        return self.rows[row].get("localized_name") or f"Hero {self.ids[row]}"
+
+    def columns(self, bracket: Optional[int]) -> Dict[str, np.ndarray]:
+        """Return picks and rate columns for a bracket.
+
+        `bracket` is 1-8, 0 for pro games or None for all brackets combined.
+        Ban rates are only tracked for pro games.
+        """
+        if bracket == 0:
+            return {
+                "picks": self.pro_picks,
+                "win_rate": self.pro_win_rates,
+                "pick_rate": self.pro_pick_rates,
+                "ban_rate": self.pro_ban_rates,
+            }
+        if bracket is None:
+            return {
+                "picks": self.total_picks,
+                "win_rate": self.overall_win_rates,
+                "pick_rate": self.overall_pick_rates,
+            }
+        return {
+            "picks": self.picks[:, bracket - 1],
+            "win_rate": self.win_rates[:, bracket - 1],
+            "pick_rate": self.pick_rates[:, bracket - 1],
+        }
+
+    def top(
+        self, values: np.ndarray, k: int, mask: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Return the rows of the k highest values, best first.
+
+        Only rows where `mask` is true are considered. Uses partial selection,
+        so only the selected rows are sorted.
+        """
+        rows = np.flatnonzero(mask) if mask is not None else np.arange(len(values))
+        if k <= 0:
+            return rows[:0]
+        if k < len(rows):
+            rows = rows[np.argpartition(-values[rows], k - 1)[:k]]
+        return rows[np.argsort(-values[rows], kind="stable")]
+
+    def summary(self) -> str:
+        """Overall win rate of every hero, formatted once per table."""
+        if self._summary is None:
+            self._summary = "Hero Win Rates:\n\n" + "\n".join(
+                f"{self.name(row)}: {self.overall_win_rates[row]:.2f}% win rate"
+                for row in self.name_order
+            )
+        return self._summary
+
+
+class ProPlayerDirectory:
+    """Pro players pre-sorted by (team, name, account ID) and indexed.
+
+    Hash indexes by account ID, team ID, team name and country code, plus a
+    sorted name index for prefix search, all built once per proPlayers
+    response. Index entries are positions in the sorted order, so filtered
+    results come back already ordered.
+    """
+
+    def __init__(self, pro_players: Any):
+        rows = [
+            player
+            for player in (pro_players if isinstance(pro_players, list) else [])
+            if isinstance(player, dict)
+        ]
+        self.players = sorted(
+            rows,
+            key=lambda p: (
+                p.get("team_name") or "",
+                p.get("name") or "",
+                p.get("account_id") or 0,
+            ),
+        )
+        self.by_account_id: Dict[int, Dict[str, Any]] = {}
+        self._by_team_id: Dict[int, List[int]] = {}
+        self._by_team_name: Dict[str, List[int]] = {}
+        self._by_country: Dict[str, List[int]] = {}
+        names: List[Tuple[str, int]] = []
+
+        for position, player in enumerate(self.players):
+            if player.get("account_id") is not None:
+                self.by_account_id[player["account_id"]] = player
+            if player.get("team_id") is not None:
+                self._by_team_id.setdefault(player["team_id"], []).append(position)
+            if player.get("team_name"):
+                self._by_team_name.setdefault(
+                    player["team_name"].strip().lower(), []
+                ).append(position)
+            if player.get("country_code"):
+                self._by_country.setdefault(
+                    player["country_code"].strip().upper(), []
+                ).append(position)
+            for name in {player.get("name"), player.get("personaname")}:
+                if name:
+                    names.append((name.strip().lower(), position))
+
+        names.sort()
+        self._names = [name for name, _ in names]
+        self._name_positions = [position for _, position in names]
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def _with_name_prefix(self, prefix: str) -> List[int]:
+        """Positions of players whose name or persona name starts with prefix."""
+        prefix = prefix.strip().lower()
+        start = bisect.bisect_left(self._names, prefix)
+        end = bisect.bisect_left(self._names, prefix + "\U0010ffff", lo=start)
+        return sorted(set(self._name_positions[start:end]))
+
+    def filter(
+        self,
+        team_id: Optional[int] = None,
+        team_name: Optional[str] = None,
+        country_code: Optional[str] = None,
+        name_prefix: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Return the players matching every given filter, in directory order."""
+        candidates: List[List[int]] = []
+        if team_id is not None:
+            candidates.append(self._by_team_id.get(team_id, []))
+        if team_name:
+            candidates.append(self._by_team_name.get(team_name.strip().lower(), []))
+        if country_code:
+            candidates.append(self._by_country.get(country_code.strip().upper(), []))
+        if name_prefix:
+            candidates.append(self._with_name_prefix(name_prefix))
+
+        if not candidates:
+            return self.players
+        candidates.sort(key=len)
+        others = [set(positions) for positions in candidates[1:]]
+        return [
+            self.players[position]
+            for position in candidates[0]
+            if all(position in other for other in others)
+        ]
+
+
+def trigrams(text: str) -> "set[str]":
+    """Return the padded character trigrams of a normalized name."""
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class NameMatch:
+    """A player found in the local name index."""
+
+    account_id: int
+    name: str
+    similarity: float
+
+    def as_search_result(self) -> Dict[str, Any]:
+        """Return the match shaped like an upstream search result."""
+        return {
+            "account_id": self.account_id,
+            "personaname": self.name,
+            "similarity": self.similarity,
+        }
+
+
+class PlayerNameIndex:
+    """Trigram inverted index over the player names the server has seen.
+
+    Names are normalized with normalize_name() and scored against a query by
+    trigram Jaccard similarity. Only players sharing a trigram with the
+    query are scored. The least recently updated players are dropped once
+    `max_players` is exceeded.
+    """
+
+    def __init__(self, max_players: int = NAME_INDEX_MAX_PLAYERS):
+        self.max_players = max_players
+        # account_id -> {normalized name: display name}
+        self._players: "OrderedDict[int, Dict[str, str]]" = OrderedDict()
+        self._postings: Dict[str, "set[int]"] = {}
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def add(self, account_id: Any, *names: Any):
+        """Record the names a player is known by, replacing earlier ones."""
+        if not isinstance(account_id, int):
+            return
+        normalized = {
+            normalize_name(name): name.strip()
+            for name in names
+            if isinstance(name, str) and normalize_name(name)
+        }
+        if not normalized:
+            return
+        if self._players.get(account_id) == normalized:
+            self._players.move_to_end(account_id)
+            return
+
+        self._remove(account_id)
+        self._players[account_id] = normalized
+        for gram in set().union(*(trigrams(name) for name in normalized)):
+            self._postings.setdefault(gram, set()).add(account_id)
+
+        while len(self._players) > self.max_players:
+            self._remove(next(iter(self._players)))
+
+    def _remove(self, account_id: int):
+        names = self._players.pop(account_id, None)
+        if not names:
+            return
+        for gram in set().union(*(trigrams(name) for name in names)):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(account_id)
+                if not posting:
+                    del self._postings[gram]
+
+    def search(
+        self, query: str, limit: int = 10, cutoff: float = SEARCH_LOCAL_CUTOFF
+    ) -> List[NameMatch]:
+        """Return players whose names resemble the query, most similar first."""
+        key = normalize_name(query)
+        if not key:
+            return []
+        query_grams = trigrams(key)
+        shared: Counter = Counter()
+        for gram in query_grams:
+            shared.update(self._postings.get(gram, ()))
+
+        matches = []
+        for account_id, _ in shared.most_common(max(limit * 10, 100)):
+            best_name, best_score = "", 0.0
+            for name, display in self._players[account_id].items():
+                grams = trigrams(name)
+                score = len(query_grams & grams) / len(query_grams | grams)
+                if score > best_score:
+                    best_name, best_score = display, score
+            if best_score >= cutoff:
+                matches.append(NameMatch(account_id, best_name, best_score))
+        matches.sort(key=lambda match: -match.similarity)
+        return matches[:limit]
+
+
+player_names = PlayerNameIndex()
+
+
+def _names_from_rows(rows: Any, *fields: str):
+    """Index the account IDs and name fields of a list of player rows."""
+    if not isinstance(rows, list):
+        return
+    for row in rows:
+        if isinstance(row, dict):
+            player_names.add(row.get("account_id"), *(row.get(f) for f in fields))
+
+
+def _names_from_profile(player: Any):
+    """Index the names in a players/{id} profile."""
+    if not isinstance(player, dict) or not isinstance(player.get("profile"), dict):
+        return
+    profile = player["profile"]
+    player_names.add(
+        profile.get("account_id") or player.get("account_id"),
+        profile.get("name"),
+        profile.get("personaname"),
+    )
+
+
+# Responses that carry player names, as (pattern, indexer) pairs
+PLAYER_NAME_SOURCES: List[Tuple[str, Callable[[Any], None]]] = [
+    (r"players/\d+", _names_from_profile),
+    (r"proPlayers", lambda data: _names_from_rows(data, "name", "personaname")),
+    (r"search", lambda data: _names_from_rows(data, "personaname")),
+    (r"players/\d+/peers", lambda data: _names_from_rows(data, "personaname")),
+    (r"teams/\d+/players", lambda data: _names_from_rows(data, "name")),
+]
+
+_player_name_sources: List[Tuple[Pattern[str], Callable[[Any], None]]] = [
+    (re.compile(pattern), indexer) for pattern, indexer in PLAYER_NAME_SOURCES
+]
+
+
+def index_player_names(endpoint: str, data: Any):
+    """Feed the player names in a response into the local name index."""
+    for pattern, indexer in _player_name_sources:
+        if pattern.fullmatch(endpoint):
+            try:
+                indexer(data)
+            except Exception as e:
+                logger.warning(f"Could not index player names from {endpoint}: {e}")
+            return
 
 
 def format_rank_tier(rank_tier: Optional[int]) -> str:
@@ -278,7 +2524,8 @@ def format_match_data(match: Dict[str, Any]) -> str:
     duration_formatted = format_duration(duration)
     start_time = format_timestamp(match.get("start_time", 0))
 
-    game_mode = match.get("game_mode", "Unknown")
+    constants = get_constants()
+    game_mode = constants.label("game_mode", match.get("game_mode", "Unknown"))
     radiant_win = match.get("radiant_win", False)
     winner = "Radiant" if radiant_win else "Dire"
 
@@ -308,7 +2555,7 @@ def format_match_data(match: Dict[str, Any]) -> str:
     for player in players:
         account_id = player.get("account_id", "Anonymous")
         hero_id = player.get("hero_id", "Unknown")
-        hero_name = player.get("hero_name", "Unknown Hero")
+        hero_name = player.get("hero_name") or constants.hero_name(hero_id)
         kills = player.get("kills", 0)
         deaths = player.get("deaths", 0)
         assists = player.get("assists", 0)
@@ -324,11 +2571,17 @@ def format_match_data(match: Dict[str, Any]) -> str:
             f"- GPM/XPM: {gpm}/{xpm}"
         )
     joined_player_data = "\n\n".join(player_data)
+    lobby_region = ""
+    if match.get("lobby_type") is not None:
+        lobby_region += f"Lobby: {constants.label('lobby_type', match['lobby_type'])}\n"
+    if match.get("region") is not None:
+        lobby_region += f"Region: {constants.label('region', match['region'])}\n"
     formatted_output = (
         f"Match ID: {match_id}\n"
         f"Date: {start_time}\n"
         f"Duration: {duration_formatted}\n"
         f"Game Mode: {game_mode}\n"
+        f"{lobby_region}"
         f"Teams: {radiant_team} vs {dire_team}\n"
         f"Score: {radiant_score} - {dire_score}\n"
         f"Winner: {winner}\n\n"
@@ -369,8 +2622,9 @@ def format_player_data(
     if recent_matches and isinstance(recent_matches, list):
         match_texts = []
         matches_to_show = recent_matches[:5] if len(recent_matches) > 0 else []
+        constants = get_constants()
         for match in matches_to_show:
-            hero_id = match.get("hero_id", "Unknown")
+            hero_name = constants.hero_name(match.get("hero_id", "Unknown"))
             kills = match.get("kills", 0)
             deaths = match.get("deaths", 0)
             assists = match.get("assists", 0)
@@ -384,7 +2638,7 @@ def format_player_data(
             match_texts.append(
                 f"Match ID: {match.get('match_id')}\n"
                 f"- Date: {match_date}\n"
-                f"- Hero: {hero_id}\n"
+                f"- Hero: {hero_name}\n"
                 f"- K/D/A: {kills}/{deaths}/{assists}\n"
                 f"- Result: {win}"
             )
@@ -406,8 +2660,31 @@ def format_player_data(
     )
 
 
+# Tools that may run inside run_batch, keyed by name, with a planner returning
+# the upstream endpoints the tool requests for its validated arguments.
+# Requests with query parameters can't be shared and are left to the tool.
+BATCH_PLANS: Dict[str, Callable[[Dict[str, Any]], List[str]]] = {}
+
+
+def batch_plan(plan: Callable[[Dict[str, Any]], List[str]]):
+    """Register a tool for run_batch with the endpoints it requests."""
+
+    def register(fn: Callable[..., Awaitable[str]]) -> Callable[..., Awaitable[str]]:
+        BATCH_PLANS[fn.__name__] = plan
+        return fn
+
+    return register
+
+
 # Tool Implementation
 @mcp.tool()
+@batch_plan(
+    lambda a: [
+        f"players/{a['account_id']}",
+        f"players/{a['account_id']}/wl",
+        f"players/{a['account_id']}/recentMatches",
+    ]
+)
 async def get_player_by_id(account_id: int) -> str:
     """Get a player's information by their account ID.
 
@@ -417,21 +2694,21 @@ async def get_player_by_id(account_id: int) -> str:
     Returns:
         Player information including rank, matches, and statistics
     """
-    player_data = await make_opendota_request(f"players/{account_id}")
+    # Fetch the profile, win/loss stats and recent matches concurrently
+    player_data, wl_data, recent_matches = await gather_bounded(
+        make_opendota_request(f"players/{account_id}"),
+        make_opendota_request(f"players/{account_id}/wl"),
+        make_opendota_request(f"players/{account_id}/recentMatches"),
+    )
 
     if "error" in player_data:
         return f"Error retrieving player data: {player_data['error']}"
 
-    # Get win/loss stats
-    wl_data = await make_opendota_request(f"players/{account_id}/wl")
-
-    # Get recent matches
-    recent_matches = await make_opendota_request(f"players/{account_id}/recentMatches")
-
     return format_player_data(player_data, wl_data, recent_matches)
 
 
 @mcp.tool()
+@batch_plan(lambda a: [f"players/{a['account_id']}/recentMatches"])
 async def get_player_recent_matches(account_id: int, limit: int = 5) -> str:
     """Get recent matches played by a player.
 
@@ -462,8 +2739,10 @@ async def get_player_recent_matches(account_id: int, limit: int = 5) -> str:
     matches_to_process = []
     if isinstance(recent_matches, list):
         matches_to_process = recent_matches[:limit]
+    constants = get_constants()
     for i, match in enumerate(matches_to_process):
         hero_id = match.get("hero_id", "Unknown")
+        hero_name = constants.hero_name(hero_id)
         kills = match.get("kills", 0)
         deaths = match.get("deaths", 0)
         assists = match.get("assists", 0)
@@ -482,7 +2761,7 @@ async def get_player_recent_matches(account_id: int, limit: int = 5) -> str:
             f"- Match ID: {match.get('match_id')}\n"
             f"- Date: {match_date}\n"
             f"- Duration: {duration}\n"
-            f"- Hero ID: {hero_id}\n"
+            f"- Hero: {hero_name} (ID: {hero_id})\n"
             f"- K/D/A: {kills}/{deaths}/{assists}\n"
             f"- GPM/XPM: {gpm}/{xpm}\n"
             f"- Result: {win}"
@@ -494,6 +2773,7 @@ async def get_player_recent_matches(account_id: int, limit: int = 5) -> str:
 
 
 @mcp.tool()
+@batch_plan(lambda a: [f"matches/{a['match_id']}"])
 async def get_match_data(match_id: int) -> str:
     """Get detailed data for a specific match.
 
@@ -511,7 +2791,140 @@ async def get_match_data(match_id: int) -> str:
     return format_match_data(match_data)
 
 
+def summarize_match(match_id: int, match: Dict[str, Any]) -> str:
+    """One-line summary of a match, or of why it couldn't be retrieved."""
+    if "error" in match:
+        return f"Match {match_id}: {match['error']}"
+    winner = "Radiant" if match.get("radiant_win") else "Dire"
+    return (
+        f"Match {match_id}: {winner} win "
+        f"{match.get('radiant_score', 0)}-{match.get('dire_score', 0)} "
+        f"({format_duration(match.get('duration', 0))})"
+    )
+
+
 @mcp.tool()
+async def get_matches_bulk(match_ids: List[int], ctx: Context) -> str:
+    """Get detailed data for several matches at once.
+
+    Cached matches are returned straight away and the rest are fetched
+    concurrently, with a progress notification as each match arrives.
+
+    Args:
+        match_ids: IDs of the matches to retrieve (up to 50)
+
+    Returns:
+        Detailed information for each match, in the order requested
+    """
+    unique_ids = list(dict.fromkeys(match_ids))
+    if not unique_ids:
+        return "No match IDs given."
+    if len(unique_ids) > BULK_MAX_MATCHES:
+        return f"Too many matches requested; the limit is {BULK_MAX_MATCHES}."
+
+    total = len(unique_ids)
+    results: Dict[str, Dict[str, Any]] = {}
+
+    async def deliver(endpoint: str, match: Dict[str, Any]):
+        results[endpoint] = match
+        summary = summarize_match(int(endpoint.rpartition("/")[2]), match)
+        await report_progress(ctx, len(results), total, summary)
+
+    # Serve cached matches first so they aren't queued behind upstream requests
+    pending = []
+    for match_id in unique_ids:
+        endpoint = f"matches/{match_id}"
+        entry = api_cache.get(get_cache_key(endpoint, API_PARAMS))
+        if entry is not None and entry.is_fresh():
+            await deliver(endpoint, await make_opendota_request(endpoint))
+        else:
+            pending.append(endpoint)
+    await fetch_all(pending, on_result=deliver)
+
+    sections = []
+    for match_id in unique_ids:
+        match = results[f"matches/{match_id}"]
+        if "error" in match:
+            sections.append(
+                f"Match ID: {match_id}\nError retrieving match data: {match['error']}"
+            )
+        else:
+            sections.append(format_match_data(match))
+
+    failed = sum(1 for match in results.values() if "error" in match)
+    header = f"Retrieved {total - failed} of {total} matches"
+    return header + ":\n\n" + f"\n\n{'=' * 40}\n\n".join(sections)
+
+
+@mcp.tool()
+async def get_players_bulk(account_ids: List[int], ctx: Context) -> str:
+    """Get a summary table for several players at once.
+
+    The profile and win/loss requests for every player are issued together
+    under the rate limiter instead of one player at a time.
+
+    Args:
+        account_ids: Steam32 account IDs of the players (up to 50)
+
+    Returns:
+        One row per player with name, rank, estimated MMR and win/loss record
+    """
+    unique_ids = list(dict.fromkeys(account_ids))
+    if not unique_ids:
+        return "No account IDs given."
+    if len(unique_ids) > BULK_MAX_PLAYERS:
+        return f"Too many players requested; the limit is {BULK_MAX_PLAYERS}."
+
+    endpoints = [
+        endpoint
+        for account_id in unique_ids
+        for endpoint in (f"players/{account_id}", f"players/{account_id}/wl")
+    ]
+
+    completed = 0
+
+    async def progress(endpoint: str, data: Dict[str, Any]):
+        nonlocal completed
+        completed += 1
+        await report_progress(ctx, completed, len(endpoints), endpoint)
+
+    responses = await fetch_all(endpoints, on_result=progress)
+
+    rows = []
+    for account_id in unique_ids:
+        player_data = responses[f"players/{account_id}"]
+        if "error" in player_data:
+            rows.append(f"{account_id} | Error: {player_data['error']}")
+            continue
+        if not player_data.get("profile"):
+            rows.append(f"{account_id} | Not found")
+            continue
+
+        player = parse_player(player_data)
+        name = player.personaname or "Anonymous"
+        if player.name and player.name != name:
+            name = f"{name} ({player.name})"
+        wl = responses[f"players/{account_id}/wl"]
+        if "error" in wl:
+            record = "Unknown"
+        else:
+            wins, losses = wl.get("win", 0), wl.get("lose", 0)
+            games = wins + losses
+            win_rate = (wins / games * 100) if games > 0 else 0
+            record = f"{wins}/{losses} ({win_rate:.1f}%)"
+        rows.append(
+            f"{account_id} | {name} | {format_rank_tier(player.rank_tier)} | "
+            f"{player.mmr_estimate or 'Unknown'} | {record}"
+        )
+
+    return (
+        f"Players ({len(unique_ids)}):\n\n"
+        "Account ID | Name | Rank | Est. MMR | Win/Loss (Win Rate)\n" + "\n".join(rows)
+    )
+
+
+@mcp.tool()
+@batch_plan(lambda a: [f"players/{a['account_id']}/wl"])
 async def get_player_win_loss(account_id: int) -> str:
     """Get win/loss statistics for a player.
 
@@ -541,6 +2954,7 @@ async def get_player_win_loss(account_id: int) -> str:
 
 
 @mcp.tool()
+@batch_plan(lambda a: [f"players/{a['account_id']}/heroes", "heroes"])
 async def get_player_heroes(account_id: int, limit: int = 5) -> str:
     """Get a player's most played heroes.
 
@@ -554,8 +2968,11 @@ async def get_player_heroes(account_id: int, limit: int = 5) -> str:
     if limit > 20:
         limit = 20  # Cap for reasonable response size
 
-    # Get hero usage data
-    heroes_data = await make_opendota_request(f"players/{account_id}/heroes")
+    # Get hero usage data and the hero lookup table concurrently
+    heroes_data, hero_index = await gather_bounded(
+        make_opendota_request(f"players/{account_id}/heroes"),
+        get_hero_index(),
+    )
 
     if "error" in heroes_data:
         return f"Error retrieving heroes data: {heroes_data['error']}"
@@ -563,40 +2980,6 @@ async def get_player_heroes(account_id: int, limit: int = 5) -> str:
     if not heroes_data or not isinstance(heroes_data, list) or len(heroes_data) == 0:
         return "No hero data found for this player."
 
-    # Get hero lookup table from cache or API
-    heroes_names = await make_opendota_request("heroes")
-    hero_id_to_name = {}
-
-    if isinstance(heroes_names, list) and heroes_names:
-        # Process the heroes data to create a mapping
-        for hero in heroes_names:
-            if isinstance(hero, dict) and "id" in hero and "localized_name" in hero:
-                hero_id = hero.get("id")
-                hero_name = hero.get("localized_name")
-                if hero_id is not None and hero_name is not None:
-                    hero_id_to_name[hero_id] = hero_name
-    else:
-        # Fallback to a minimal hero dictionary if API fails
-        logger.warning("Failed to get hero names, using fallback dictionary")
-        hero_id_to_name = {
-            1: "Anti-Mage",
-            2: "Axe",
-            3: "Bane",
-            4: "Bloodseeker",
-            5: "Crystal Maiden",
-            6: "Drow Ranger",
-            7: "Earthshaker",
-            8: "Juggernaut",
-            9: "Mirana",
-            10: "Morphling",
-            11: "Shadow Fiend",
-            12: "Phantom Lancer",
-            13: "Puck",
-            14: "Pudge",
-            15: "Razor",
-            # This is just a small sample of common heroes
-        }
-
     try:
         # Sort heroes by games played
         sorted_heroes = sorted(
@@ -607,7 +2990,7 @@ async def get_player_heroes(account_id: int, limit: int = 5) -> str:
 
         for i, hero in enumerate(sorted_heroes[:limit]):
             hero_id = hero.get("hero_id", 0)
-            hero_name = hero_id_to_name.get(hero_id, f"Hero {hero_id}")
+            hero_name = hero_index.name(hero_id)
             games = hero.get("games", 0)
             wins = hero.get("win", 0)
             win_rate = (wins / games * 100) if games > 0 else 0
@@ -629,97 +3012,284 @@ async def get_player_heroes(account_id: int, limit: int = 5) -> str:
         return f"Error processing heroes data: {str(e)}"
 
 
+async def sync_match_history(account_id: int) -> Union[int, Dict[str, Any]]:
+    """Bring a player's stored match history up to date.
+
+    The first sync downloads the whole history; later ones only ask for the
+    days since the newest stored match. Histories synced less than
+    MATCH_HISTORY_SYNC_INTERVAL ago are left alone. Returns the number of new
+    matches, or the error dict when the request fails.
+    """
+    state = await asyncio.to_thread(match_history.sync_state, account_id)
+    params: Dict[str, Any] = {"project": list(MATCH_HISTORY_FIELDS)}
+    newest_match_id = 0
+    if state is not None:
+        synced_at, newest_match_id, newest_start_time = state
+        if time.time() - synced_at < MATCH_HISTORY_SYNC_INTERVAL:
+            return 0
+        if newest_start_time:
+            # `date` counts whole days back from now; one more covers the boundary
+            days = (time.time() - newest_start_time) / 86400
+            params["date"] = math.ceil(days) + 1
+
+    matches = await make_opendota_request(f"players/{account_id}/matches", params)
+    if isinstance(matches, dict) and "error" in matches:
+        return matches
+    if not isinstance(matches, list):
+        return {"error": "Unexpected match history response"}
+
+    new_matches = [
+        match
+        for match in matches
+        if isinstance(match, dict) and (match.get("match_id") or 0) > newest_match_id
+    ]
+    added = await asyncio.to_thread(match_history.add, account_id, new_matches)
+    logger.info(f"Synced {added} new matches for player {account_id}")
+    return added
+
+
 @mcp.tool()
-async def get_hero_stats(hero_id: Optional[int] = None) -> str:
+@batch_plan(lambda a: ["heroes"] if a["hero_id"] is None and a["hero_name"] else [])
+async def get_player_match_history(
+    account_id: int,
+    hero_id: Optional[int] = None,
+    hero_name: Optional[str] = None,
+    limit: int = 10,
+) -> str:
+    """Get a summary of a player's whole match history, optionally for one hero.
+
+    The history is kept locally: it is downloaded in full the first time and
+    only newer matches are fetched afterwards.
+
+    Args:
+        account_id: Steam32 account ID of the player
+        hero_id: Optional hero ID to restrict the history to
+        hero_name: Optional hero name to look up instead of an ID (fuzzy matched)
+        limit: Number of latest matches to list (default: 10)
+
+    Returns:
+        Totals over the history, most played heroes and the latest matches
+    """
+    limit = max(1, min(limit, 50))  # SQLite treats a negative LIMIT as no limit
+
+    if hero_id is None and hero_name:
+        hero_id = (await get_hero_index()).find(hero_name)
+        if hero_id is None:
+            return f"No hero found matching '{hero_name}'."
+
+    synced = await sync_match_history(account_id)
+    note = ""
+    if isinstance(synced, dict):
+        if await asyncio.to_thread(match_history.sync_state, account_id) is None:
+            return f"Error retrieving match history: {synced['error']}"
+        note = f"\n(Showing stored history; sync failed: {synced['error']})"
+
+    constants = get_constants()
+    scope = f" on {constants.hero_name(hero_id)}" if hero_id is not None else ""
+    games, wins, kills, deaths, assists, first, last = await asyncio.to_thread(
+        match_history.totals, account_id, hero_id
+    )
+    if games == 0:
+        return f"No matches found for player ID {account_id}{scope}."
+
+    lines = [
+        f"Match History for Player ID {account_id}{scope}:{note}",
+        "",
+        f"Matches: {games} ({format_timestamp(first)} to {format_timestamp(last)})",
+        f"Win/Loss: {wins}/{games - wins} ({wins / games * 100:.1f}% win rate)",
+        f"Average K/D/A: {kills:.1f}/{deaths:.1f}/{assists:.1f}",
+    ]
+
+    if hero_id is None:
+        heroes = await asyncio.to_thread(match_history.heroes, account_id)
+        lines += ["", "Most Played Heroes:"]
+        lines += [
+            f"- {constants.hero_name(hero)}: {played} games, "
+            f"{won / played * 100:.1f}% win rate"
+            for hero, played, won in heroes
+        ]
+
+    latest = await asyncio.to_thread(match_history.recent, account_id, hero_id, limit)
+    lines += ["", f"Latest {len(latest)} Matches:"]
+    for match in latest:
+        lines.append(
+            f"- Match {match['match_id']} ({format_timestamp(match['start_time'])}): "
+            f"{constants.hero_name(match['hero_id'])}, "
+            f"{'Won' if match['win'] else 'Lost'}, "
+            f"K/D/A {match['kills']}/{match['deaths']}/{match['assists']}, "
+            f"{format_duration(match['duration'] or 0)}"
+        )
+
+    return "\n".join(lines)
+
+
+@mcp.tool()
+@batch_plan(
+    lambda a: ["heroStats"]
+    + (["heroes"] if a["hero_id"] is None and a["hero_name"] else [])
+)
+async def get_hero_stats(
+    hero_id: Optional[int] = None, hero_name: Optional[str] = None
+) -> str:
     """Get statistics for heroes.
 
     Args:
         hero_id: Optional hero ID to get stats for a specific hero
+        hero_name: Optional hero name to look up instead of an ID (fuzzy matched)
 
     Returns:
         Hero statistics including win rates by skill bracket
     """
-    hero_stats = await make_opendota_request("heroStats")
+    if hero_id is None and hero_name:
+        hero_id = (await get_hero_index()).find(hero_name)
+        if hero_id is None:
+            return f"No hero found matching '{hero_name}'."
 
-    if "error" in hero_stats:
-        return f"Error retrieving hero stats: {hero_stats['error']}"
+    table = await get_derived_index("heroStats", HeroStatsTable)
 
-    if hero_id is not None:
-        # Filter for specific hero
-        hero_stats = [
-            hero
-            for hero in hero_stats
-            if hero.get("id") == hero_id or hero.get("hero_id") == hero_id
-        ]
+    if isinstance(table, dict):
+        return f"Error retrieving hero stats: {table['error']}"
 
-        if not hero_stats:
-            return f"No stats found for hero ID {hero_id}."
-
-        hero = hero_stats[0]
-        localized_name = hero.get("localized_name", f"Hero {hero_id}")
-
-        # Calculate win rates by bracket
-        brackets = [
-            "herald",
-            "guardian",
-            "crusader",
-            "archon",
-            "legend",
-            "ancient",
-            "divine",
-            "immortal",
-        ]
-        bracket_stats = []
-
-        for i, bracket in enumerate(brackets, 1):
-            picks = hero.get(f"{i}_pick", 0)
-            wins = hero.get(f"{i}_win", 0)
-            win_rate = (wins / picks * 100) if picks > 0 else 0
-            bracket_stats.append(
-                f"{bracket.capitalize()}: {win_rate:.2f}% ({wins}/{picks})"
-            )
+    if hero_id is None:
+        # Return summary of all heroes
+        return table.summary()
 
-        # Pro stats
-        pro_picks = hero.get("pro_pick", 0)
-        pro_wins = hero.get("pro_win", 0)
-        pro_win_rate = (pro_wins / pro_picks * 100) if pro_picks > 0 else 0
-        pro_ban_rate = hero.get("pro_ban", 0)
+    row = table.row(hero_id)
+    if row is None:
+        return f"No stats found for hero ID {hero_id}."
+
+    hero = table.rows[row]
+    localized_name = hero.get("localized_name", f"Hero {hero_id}")
+
+    # Win rates by bracket
+    bracket_stats = [
+        f"{bracket.capitalize()}: {table.win_rates[row, i]:.2f}% "
+        f"({table.wins[row, i]}/{table.picks[row, i]})"
+        for i, bracket in enumerate(HERO_BRACKETS)
+    ]
+
+    # Pro stats
+    pro_picks = table.pro_picks[row]
+    pro_wins = table.pro_wins[row]
+    pro_win_rate = table.pro_win_rates[row]
+    pro_ban_rate = table.pro_bans[row]
+
+    # Hero attributes
+    roles = hero.get("roles", [])
+    primary_attr = hero.get("primary_attr", "Unknown")
+    attack_type = hero.get("attack_type", "Unknown")
+
+    return (
+        f"Hero Stats for {localized_name} (ID: {hero_id}):\n\n"
+        f"Roles: {', '.join(roles)}\n"
+        f"Primary Attribute: {primary_attr}\n"
+        f"Attack Type: {attack_type}\n\n"
+        f"Win Rates by Bracket:\n"
+        f"{', '.join(bracket_stats)}\n\n"
+        f"Pro Scene:\n"
+        f"Pick Rate: {pro_picks} picks\n"
+        f"Win Rate: {pro_win_rate:.2f}% ({pro_wins}/{pro_picks})\n"
+        f"Ban Rate: {pro_ban_rate} bans"
+    )
 
-        # Hero attributes
-        roles = hero.get("roles", [])
-        primary_attr = hero.get("primary_attr", "Unknown")
-        attack_type = hero.get("attack_type", "Unknown")
 
+def parse_bracket(bracket: Union[str, int]) -> Optional[int]:
+    """Parse a bracket name or number into 1-8, 0 for pro or None for all.
+
+    Raises ValueError for anything else.
+    """
+    value = str(bracket).strip().lower()
+    if value in ("all", ""):
+        return None
+    if value == "pro":
+        return 0
+    if value.isdigit() and 1 <= int(value) <= len(HERO_BRACKETS):
+        return int(value)
+    if value in HERO_BRACKETS:
+        return HERO_BRACKETS.index(value) + 1
+    raise ValueError(f"Unknown bracket '{bracket}'")
+
+
+HERO_META_METRICS = {
+    "win_rate": "Win Rate",
+    "pick_rate": "Pick Rate",
+    "ban_rate": "Ban Rate",
+}
+
+
+@mcp.tool()
+@batch_plan(lambda a: ["heroStats"])
+async def get_hero_meta(
+    sort_by: str = "win_rate",
+    bracket: str = "all",
+    min_picks: int = 0,
+    limit: int = 10,
+) -> str:
+    """Rank heroes by win rate, pick rate or ban rate.
+
+    Args:
+        sort_by: Metric to rank by: win_rate, pick_rate or ban_rate (pro only)
+        bracket: Skill bracket: all, pro, 1-8, or a name such as divine
+        min_picks: Ignore heroes with fewer picks than this in the bracket
+        limit: Number of heroes to return (default: 10)
+
+    Returns:
+        The top heroes for the metric, with their win and pick rates
+    """
+    if limit > 50:
+        limit = 50  # Cap for reasonable response size
+
+    if sort_by not in HERO_META_METRICS:
         return (
-            f"Hero Stats for {localized_name} (ID: {hero_id}):\n\n"
-            f"Roles: {', '.join(roles)}\n"
-            f"Primary Attribute: {primary_attr}\n"
-            f"Attack Type: {attack_type}\n\n"
-            f"Win Rates by Bracket:\n"
-            f"{', '.join(bracket_stats)}\n\n"
-            f"Pro Scene:\n"
-            f"Pick Rate: {pro_picks} picks\n"
-            f"Win Rate: {pro_win_rate:.2f}% ({pro_wins}/{pro_picks})\n"
-            f"Ban Rate: {pro_ban_rate} bans"
+            f"Unknown metric '{sort_by}'. "
+            f"Use one of: {', '.join(HERO_META_METRICS)}."
         )
-    else:
-        # Return summary of all heroes
-        formatted_heroes = []
+    try:
+        bracket_number = parse_bracket(bracket)
+    except ValueError as e:
+        return f"{e}. Use all, pro, 1-8 or one of: {', '.join(HERO_BRACKETS)}."
+    if sort_by == "ban_rate" and bracket_number != 0:
+        return "Ban rates are only available for the pro bracket."
+
+    table = await get_derived_index("heroStats", HeroStatsTable)
 
-        for hero in sorted(hero_stats, key=lambda x: x.get("localized_name", "")):
-            localized_name = hero.get("localized_name", f"Hero {hero.get('id')}")
+    if isinstance(table, dict):
+        return f"Error retrieving hero stats: {table['error']}"
 
-            # Calculate overall win rate
-            total_picks = sum(hero.get(f"{i}_pick", 0) for i in range(1, 9))
-            total_wins = sum(hero.get(f"{i}_win", 0) for i in range(1, 9))
-            win_rate = (total_wins / total_picks * 100) if total_picks > 0 else 0
+    columns = table.columns(bracket_number)
+    rows = table.top(columns[sort_by], limit, columns["picks"] >= max(min_picks, 1))
 
-            formatted_heroes.append(f"{localized_name}: {win_rate:.2f}% win rate")
+    if len(rows) == 0:
+        return "No heroes match these filters."
 
-        return "Hero Win Rates:\n\n" + "\n".join(formatted_heroes)
+    if bracket_number is None:
+        filters = "All Brackets"
+    elif bracket_number == 0:
+        filters = "Pro"
+    else:
+        filters = HERO_BRACKETS[bracket_number - 1].capitalize()
+    if min_picks > 0:
+        filters += f", min {min_picks} picks"
+
+    lines = []
+    for rank, row in enumerate(rows, 1):
+        line = (
+            f"{rank}. {table.name(row)} (ID: {table.ids[row]}) - "
+            f"Win Rate: {columns['win_rate'][row]:.2f}% | "
+            f"Pick Rate: {columns['pick_rate'][row]:.2f}% | "
+            f"Picks: {columns['picks'][row]}"
+        )
+        if "ban_rate" in columns:
+            line += f" | Ban Rate: {columns['ban_rate'][row]:.2f}%"
+        lines.append(line)
+
+    return f"Top Heroes by {HERO_META_METRICS[sort_by]} ({filters}):\n\n" + "\n".join(
+        lines
+    )
 
 
 @mcp.tool()
+@batch_plan(lambda a: [])
 async def search_player(query: str) -> str:
     """Search for players by name.
 
@@ -729,10 +3299,39 @@ async def search_player(query: str) -> str:
     Returns:
         List of matching players
     """
-    search_results = await make_opendota_request("search", {"q": query})
-
-    if "error" in search_results:
-        return f"Error searching for players: {search_results['error']}"
+    # Names the server has already seen answer most lookups without a request
+    local_matches = player_names.search(query)
+    confident = [
+        match
+        for match in local_matches
+        if match.similarity >= SEARCH_LOCAL_MIN_SIMILARITY
+    ]
+    if SEARCH_LOCAL_MIN_HITS > 0 and len(confident) >= SEARCH_LOCAL_MIN_HITS:
+        cache_metrics["local_search_hits"] += 1
+        search_results = [match.as_search_result() for match in local_matches]
+    else:
+        search_results = await make_opendota_request("search", {"q": query})
+
+        if "error" in search_results:
+            if not confident:
+                return f"Error searching for players: {search_results['error']}"
+            search_results = []
+        if isinstance(search_results, list):
+            # Keep confident local matches the upstream search didn't return
+            upstream_ids = {
+                player.get("account_id")
+                for player in search_results
+                if isinstance(player, dict)
+            }
+            search_results = sorted(
+                search_results
+                + [
+                    match.as_search_result()
+                    for match in confident
+                    if match.account_id not in upstream_ids
+                ],
+                key=lambda player: -(player.get("similarity") or 0),
+            )
 
     if not search_results or len(search_results) == 0:
         return f"No players found matching '{query}'."
@@ -758,11 +3357,22 @@ async def search_player(query: str) -> str:
 
 
 @mcp.tool()
-async def get_pro_players(limit: int = 10) -> str:
+@batch_plan(lambda a: ["proPlayers"])
+async def get_pro_players(
+    limit: int = 10,
+    team_id: Optional[int] = None,
+    team_name: Optional[str] = None,
+    country_code: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+) -> str:
     """Get list of professional players.
 
     Args:
         limit: Number of players to retrieve (default: 10)
+        team_id: Only include players on the team with this ID
+        team_name: Only include players on this team (case-insensitive)
+        country_code: Only include players from this country, e.g. "UA"
+        name_prefix: Only include players whose name starts with this text
 
     Returns:
         List of professional players
@@ -770,23 +3380,18 @@ async def get_pro_players(limit: int = 10) -> str:
     if limit > 30:
         limit = 30  # Cap for reasonable response size
 
-    pro_players = await make_opendota_request("proPlayers")
+    directory = await get_derived_index("proPlayers", ProPlayerDirectory)
 
-    if "error" in pro_players:
-        return f"Error retrieving pro players: {pro_players['error']}"
+    if isinstance(directory, dict):
+        return f"Error retrieving pro players: {directory['error']}"
 
-    if not pro_players or not isinstance(pro_players, list) or len(pro_players) == 0:
+    if not directory:
         return "No professional players found."
 
-    # Sort by name for consistency
-    sorted_players = sorted(
-        pro_players,
-        key=lambda x: (
-            x.get("team_name", ""),
-            x.get("name", ""),
-            x.get("account_id", 0),
-        ),
-    )
+    sorted_players = directory.filter(team_id, team_name, country_code, name_prefix)
+
+    if not sorted_players:
+        return "No professional players match these filters."
 
     formatted_players = []
 
@@ -807,6 +3412,7 @@ async def get_pro_players(limit: int = 10) -> str:
 
 
 @mcp.tool()
+@batch_plan(lambda a: ["proMatches"])
 async def get_pro_matches(limit: int = 5) -> str:
     """Get recent professional matches.
 
@@ -858,6 +3464,7 @@ async def get_pro_matches(limit: int = 5) -> str:
 
 
 @mcp.tool()
+@batch_plan(lambda a: [f"players/{a['account_id']}/peers"])
 async def get_player_peers(account_id: int, limit: int = 5) -> str:
     """Get players who have played with the specified player.
 
@@ -902,26 +3509,24 @@ async def get_player_peers(account_id: int, limit: int = 5) -> str:
 
 
 @mcp.tool()
+@batch_plan(lambda a: ["heroes"])
 async def get_heroes() -> str:
     """Get list of all Dota 2 heroes.
 
     Returns:
         List of all heroes with basic information
     """
-    heroes_data = await make_opendota_request("heroes")
+    hero_index = await get_derived_index("heroes", HeroIndex)
 
-    if "error" in heroes_data:
-        return f"Error retrieving heroes data: {heroes_data['error']}"
+    if isinstance(hero_index, dict):
+        return f"Error retrieving heroes data: {hero_index['error']}"
 
-    if not heroes_data or not isinstance(heroes_data, list) or len(heroes_data) == 0:
+    if not hero_index:
         return "No heroes data found."
 
-    # Sort by hero ID
-    sorted_heroes = sorted(heroes_data, key=lambda x: x.get("id", 0))
-
     formatted_heroes = []
 
-    for hero in sorted_heroes:
+    for hero in hero_index.heroes:
         hero_id = hero.get("id", 0)
         name = hero.get("localized_name", f"Hero {hero_id}")
         primary_attr = hero.get("primary_attr", "Unknown")
@@ -939,6 +3544,7 @@ async def get_heroes() -> str:
 
 
 @mcp.tool()
+@batch_plan(lambda a: [f"players/{a['account_id']}/totals"])
 async def get_player_totals(account_id: int) -> str:
     """Get player's overall stats totals.
 
@@ -976,6 +3582,7 @@ async def get_player_totals(account_id: int) -> str:
 
 
 @mcp.tool()
+@batch_plan(lambda a: [f"players/{a['account_id']}/rankings", "heroes"])
 async def get_player_rankings(account_id: int) -> str:
     """Get player hero rankings.
 
@@ -985,7 +3592,11 @@ async def get_player_rankings(account_id: int) -> str:
     Returns:
         Player's hero rankings
     """
-    rankings_data = await make_opendota_request(f"players/{account_id}/rankings")
+    # Get rankings and hero names (just for context) concurrently
+    rankings_data, hero_index = await gather_bounded(
+        make_opendota_request(f"players/{account_id}/rankings"),
+        get_hero_index(),
+    )
 
     if "error" in rankings_data:
         return f"Error retrieving rankings data: {rankings_data['error']}"
@@ -997,23 +3608,11 @@ async def get_player_rankings(account_id: int) -> str:
     ):
         return "No ranking data found for this player."
 
-    # Get hero names (just for context)
-    heroes_data = await make_opendota_request("heroes")
-    hero_id_to_name = {}
-
-    if not isinstance(heroes_data, dict) and isinstance(heroes_data, list):
-        for hero in heroes_data:
-            if isinstance(hero, dict) and "id" in hero and "localized_name" in hero:
-                hero_id = hero.get("id")
-                hero_name = hero.get("localized_name")
-                if hero_id is not None and hero_name is not None:
-                    hero_id_to_name[hero_id] = hero_name
-
     formatted_rankings = []
 
     for ranking in rankings_data:
         hero_id = ranking.get("hero_id", 0)
-        hero_name = hero_id_to_name.get(hero_id, f"Hero {hero_id}")
+        hero_name = hero_index.name(hero_id)
         score = ranking.get("score", 0)
         percent_rank = ranking.get("percent_rank", 0) * 100  # Convert to percentage
 
@@ -1029,6 +3628,7 @@ async def get_player_rankings(account_id: int) -> str:
 
 
 @mcp.tool()
+@batch_plan(lambda a: [f"players/{a['account_id']}/wordcloud"])
 async def get_player_wordcloud(account_id: int) -> str:
     """Get most common words used by player in chat.
 
@@ -1064,6 +3664,7 @@ async def get_player_wordcloud(account_id: int) -> str:
 
 
 @mcp.tool()
+@batch_plan(lambda a: [f"teams/{a['team_id']}", f"teams/{a['team_id']}/players"])
 async def get_team_info(team_id: int) -> str:
     """Get information about a team.
 
@@ -1073,7 +3674,11 @@ async def get_team_info(team_id: int) -> str:
     Returns:
         Team information
     """
-    team_data = await make_opendota_request(f"teams/{team_id}")
+    # Fetch the team and its players concurrently
+    team_data, players_data = await gather_bounded(
+        make_opendota_request(f"teams/{team_id}"),
+        make_opendota_request(f"teams/{team_id}/players"),
+    )
 
     if "error" in team_data:
         return f"Error retrieving team data: {team_data['error']}"
@@ -1090,9 +3695,6 @@ async def get_team_info(team_id: int) -> str:
     win_rate = (wins / total_games * 100) if total_games > 0 else 0
     last_match_time = format_timestamp(team_data.get("last_match_time", 0))
 
-    # Get team players
-    players_data = await make_opendota_request(f"teams/{team_id}/players")
-
     formatted_players = []
     if isinstance(players_data, list) and players_data:
         current_players = [p for p in players_data if p.get("is_current_team_member")]
@@ -1124,6 +3726,7 @@ async def get_team_info(team_id: int) -> str:
 
 
 @mcp.tool()
+@batch_plan(lambda a: ["publicMatches"])
 async def get_public_matches(limit: int = 5) -> str:
     """Get recent public matches.
 
@@ -1150,6 +3753,7 @@ async def get_public_matches(limit: int = 5) -> str:
     matches_to_show = []
     if isinstance(matches_data, list):
         matches_to_show = matches_data[:limit]
+    constants = get_constants()
     for i, match in enumerate(matches_to_show):
         match_id = match.get("match_id", "Unknown")
         duration = format_duration(match.get("duration", 0))
@@ -1168,14 +3772,16 @@ async def get_public_matches(limit: int = 5) -> str:
             f"   Duration: {duration}\n"
             f"   Avg. Rank: {rank_name}\n"
             f"   Winner: {winner}\n"
-            f"   Radiant Heroes: {', '.join(str(h) for h in radiant_heroes)}\n"
-            f"   Dire Heroes: {', '.join(str(h) for h in dire_heroes)}"
+            f"   Radiant Heroes: "
+            f"{', '.join(constants.hero_name(h) for h in radiant_heroes)}\n"
+            f"   Dire Heroes: {', '.join(constants.hero_name(h) for h in dire_heroes)}"
         )
 
     return "Recent Public Matches:\n\n" + "\n\n".join(formatted_matches)
 
 
 @mcp.tool()
+@batch_plan(lambda a: [f"matches/{a['match_id']}", "heroes"])
 async def get_match_heroes(match_id: int) -> str:
     """Get heroes played in a specific match.
 
@@ -1185,7 +3791,11 @@ async def get_match_heroes(match_id: int) -> str:
     Returns:
         List of heroes played by each player in the match
     """
-    match_data = await make_opendota_request(f"matches/{match_id}")
+    # Get the match and hero names concurrently
+    match_data, hero_index = await gather_bounded(
+        make_opendota_request(f"matches/{match_id}"),
+        get_hero_index(),
+    )
 
     if "error" in match_data:
         return f"Error retrieving match data: {match_data['error']}"
@@ -1193,25 +3803,13 @@ async def get_match_heroes(match_id: int) -> str:
     if not match_data or "players" not in match_data:
         return f"No data found for match ID {match_id}."
 
-    # Get hero names
-    heroes_data = await make_opendota_request("heroes")
-    hero_id_to_name = {}
-
-    if not isinstance(heroes_data, dict) and isinstance(heroes_data, list):
-        for hero in heroes_data:
-            if isinstance(hero, dict) and "id" in hero and "localized_name" in hero:
-                hero_id = hero.get("id")
-                hero_name = hero.get("localized_name")
-                if hero_id is not None and hero_name is not None:
-                    hero_id_to_name[hero_id] = hero_name
-
     # Process players
     radiant_players = []
     dire_players = []
 
     for player in match_data["players"]:
         hero_id = player.get("hero_id", 0)
-        hero_name = hero_id_to_name.get(hero_id, f"Hero {hero_id}")
+        hero_name = hero_index.name(hero_id)
         account_id = player.get("account_id", "Anonymous")
         name = player.get("personaname", "Unknown")
         kills = player.get("kills", 0)
@@ -1238,35 +3836,202 @@ async def get_match_heroes(match_id: int) -> str:
     )
 
 
+@mcp.tool()
+@batch_plan(lambda a: [])
+async def get_cache_stats() -> str:
+    """Get statistics for the server's response cache.
+
+    Returns:
+        Cache size, hit and miss counts, and compression ratio and timings
+    """
+    # Counters that were never incremented read as 0
+    metrics = Counter(get_cache_metrics())
+    lookups = metrics["hits"] + metrics["stale_hits"] + metrics["misses"]
+    hit_rate = (
+        (metrics["hits"] + metrics["stale_hits"]) / lookups * 100 if lookups else 0
+    )
+    lines = [
+        "Response Cache:",
+        f"Entries: {metrics['entries']} ({metrics['bytes'] / 1024:.1f} KB)",
+        f"Hits: {metrics['hits']} fresh, {metrics['stale_hits']} stale, "
+        f"{metrics['disk_hits']} from disk ({hit_rate:.1f}% hit rate)",
+        f"Misses: {metrics['misses']}",
+        f"Revalidated: {metrics['revalidated']}",
+        f"Not found / held down: {metrics['negative_hits']} / "
+        f"{metrics['hold_down_hits']}",
+        f"Evictions: {metrics['evictions']}",
+    ]
+    if metrics["codec"] is None:
+        lines.append("Compression: off")
+    else:
+        lines.append(
+            f"Compression: {metrics['codec']}, {metrics['compressions']} entries, "
+            f"{metrics['compression_ratio']:.1f}x ratio"
+        )
+        lines.append(
+            f"Compression time: {metrics['avg_compress_ms']:.3f} ms, "
+            f"decompression {metrics['avg_decompress_ms']:.3f} ms "
+            f"({metrics['decompressions']} reads)"
+        )
+    return "\n".join(lines)
+
+
+def describe_call(tool: str, arguments: Dict[str, Any]) -> str:
+    """Render a tool invocation as it would be written in Python."""
+    args = ", ".join(f"{name}={value!r}" for name, value in arguments.items())
+    return f"{tool}({args})"
+
+
+@mcp.tool()
+async def run_batch(calls: List[Dict[str, Any]], ctx: Context) -> str:
+    """Run several read-only tools together, fetching shared data only once.
+
+    Every upstream request the calls need is worked out first, each distinct
+    one is fetched once in parallel, and then every tool runs against those
+    shared responses. Use this when a question needs several tools at once.
+
+    Args:
+        calls: Tool invocations (up to 20), each an object like
+            {"tool": "get_player_win_loss", "arguments": {"account_id": 123}}
+
+    Returns:
+        The output of each tool, in the order given
+    """
+    if not calls:
+        return "No tool calls given."
+    if len(calls) > BATCH_MAX_CALLS:
+        return f"Too many tool calls; the limit is {BATCH_MAX_CALLS}."
+
+    # Validate every call the way a direct tool call would be, and plan its
+    # upstream requests, before fetching any
+    planned: List[Tuple[str, Optional[Dict[str, Any]], str]] = []
+    endpoints: List[str] = []
+    for call in calls:
+        if not isinstance(call, dict):
+            call = {}
+        name, arguments = call.get("tool"), call.get("arguments") or {}
+        known = isinstance(name, str) and name in BATCH_PLANS
+        tool = mcp._tool_manager.get_tool(name) if known else None
+        if tool is None:
+            planned.append((str(name), None, f"Error: Unknown tool {name!r}"))
+            continue
+        if not isinstance(arguments, dict):
+            planned.append((name, None, "Error: Invalid arguments: not an object"))
+            continue
+        try:
+            metadata = tool.fn_metadata
+            validated = metadata.arg_model.model_validate(
+                metadata.pre_parse_json(arguments)
+            ).model_dump_one_level()
+        except ValidationError as e:
+            problems = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                for error in e.errors()
+            )
+            planned.append((name, None, f"Error: Invalid arguments: {problems}"))
+            continue
+        planned.append((name, validated, ""))
+        endpoints.extend(BATCH_PLANS[name](validated))
+
+    endpoints = list(dict.fromkeys(endpoints))
+    completed = 0
+
+    async def progress(endpoint: str, data: Dict[str, Any]):
+        nonlocal completed
+        completed += 1
+        await report_progress(ctx, completed, len(endpoints), endpoint)
+
+    responses = await fetch_all(endpoints, on_result=progress)
+
+    async def run(name: str, arguments: Dict[str, Any]) -> str:
+        try:
+            return await mcp._tool_manager.get_tool(name).fn(**arguments)
+        except Exception as e:
+            logger.error(f"Batched {name} failed: {str(e)}")
+            return f"Error: {str(e)}"
+
+    token = _batch_responses.set(responses)
+    try:
+        outputs = await asyncio.gather(
+            *(run(name, args) for name, args, _ in planned if args is not None)
+        )
+    finally:
+        _batch_responses.reset(token)
+
+    sections = []
+    remaining = iter(outputs)
+    for name, arguments, error in planned:
+        output = next(remaining) if arguments is not None else error
+        sections.append(f"{describe_call(name, arguments or {})}:\n{output}")
+
+    header = f"Ran {len(calls)} tool calls sharing {len(responses)} upstream requests"
+    return header + ":\n\n" + f"\n\n{'=' * 40}\n\n".join(sections)
+
+
 def cleanup_cache():
     """Cleanup expired cache entries to prevent memory leaks."""
-    current_time = time.time()
-    expired_keys = [
-        key
-        for key, (timestamp, _) in api_cache.items()
-        if current_time - timestamp >= CACHE_TTL
-    ]
+    removed = api_cache.purge_expired()
 
-    for key in expired_keys:
-        del api_cache[key]
+    cutoff = time.time() - SERVER_ERROR_HOLD_DOWN
+    for key in [k for k, (_, at) in _server_error_counts.items() if at < cutoff]:
+        del _server_error_counts[key]
 
-    logger.info(
-        f"Cache cleanup: removed {len(expired_keys)} expired entries, {len(api_cache)} remaining"
-    )
+    if removed:
+        logger.info(
+            f"Cache cleanup: removed {removed} expired entries, "
+            f"{len(api_cache)} remaining"
+        )
 
 
 async def start_cache_cleanup_task():
-    """Start a background task to periodically clean the cache."""
+    """Clean the cache as entries expire, for the lifetime of the server.
+
+    Sleeps until the next entry is due (at most CACHE_SWEEP_INTERVAL) rather
+    than scanning the whole cache on a fixed period.
+    """
     while True:
-        await asyncio.sleep(CACHE_TTL)  # Run cleanup every cache TTL period
         cleanup_cache()
+        next_expiry = api_cache.next_expiry()
+        delay = CACHE_SWEEP_INTERVAL
+        if next_expiry is not None:
+            delay = min(delay, max(next_expiry - time.time(), 0.0) + 0.01)
+        await asyncio.sleep(delay)
+
+
+def constants_refresh_affordable() -> bool:
+    """Check whether enough of the daily request budget is left for a refresh."""
+    remaining = rate_limiter.remaining()
+    return all(
+        remaining[budget.name] >= budget.limit * CONSTANTS_REFRESH_MIN_BUDGET
+        for budget in rate_limiter.budgets
+        if budget.name == "day"
+    )
+
+
+async def start_constants_refresh_task():
+    """Refresh the constants tables periodically, for the lifetime of the server.
+
+    The first refresh runs shortly after startup so every session resolves
+    new IDs. Constants are cached for a day, so with the disk cache enabled
+    most sessions refresh without going upstream; refreshes are skipped while
+    the daily request budget is low, leaving it to the tools.
+    """
+    delay = CONSTANTS_REFRESH_DELAY
+    while True:
+        await asyncio.sleep(delay)
+        delay = CONSTANTS_REFRESH_INTERVAL
+        if not constants_refresh_affordable():
+            logger.info("Daily request budget is low, skipping constants refresh")
+            continue
+        try:
+            await refresh_constants()
+        except Exception as e:
+            logger.error(f"Error refreshing constants: {str(e)}")
 
 
 async def startup():
     """Run startup tasks."""
     logger.info("Starting OpenDota MCP Server")
-    # Start cache cleanup task in the background
-    asyncio.create_task(start_cache_cleanup_task())
 
     # If you want to do a quick API health check on startup
     try:
@@ -1284,10 +4049,7 @@ async def startup():
 
 
 if __name__ == "__main__":
-    # Startup
-    asyncio.run(startup())
-
-    # Run the server
+    # Startup tasks and the cache sweeper run in the server lifespan
     logger.info(f"OpenDota API key present: {bool(OPENDOTA_API_KEY)}")
     logger.info("Starting MCP server with stdio transport")
     mcp.run(transport="stdio")
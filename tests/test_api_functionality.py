@@ -7,29 +7,42 @@ import asyncio
 import os
 import sys
 import unittest
-from unittest.mock import AsyncMock, patch
+from collections import Counter
+from unittest.mock import AsyncMock, call, patch
 
 # Add the src directory to the path so we can import the modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from src.opendota_server.server import (
+    BATCH_PLANS,
+    MatchHistoryStore,
+    PlayerNameIndex,
+    ResponseCache,
+    get_cache_stats,
+    get_hero_meta,
     get_hero_stats,
     get_heroes,
     get_match_data,
     get_match_heroes,
+    get_matches_bulk,
     get_player_by_id,
     get_player_heroes,
+    get_player_match_history,
     get_player_peers,
     get_player_rankings,
     get_player_recent_matches,
     get_player_totals,
     get_player_win_loss,
+    get_players_bulk,
     get_player_wordcloud,
     get_pro_matches,
     get_pro_players,
     get_public_matches,
     get_team_info,
+    load_compression_codec,
     make_opendota_request,
+    mcp,
+    run_batch,
     search_player,
 )
 from tests.test_api_mocks import get_mock_response
@@ -66,12 +79,17 @@ class TestMCPTools(unittest.IsolatedAsyncioTestCase):
         self.assertIn("Professional Player: Yes", result)
         self.assertIn("Team: Mock Team", result)
 
+        # The profile error still short-circuits the concurrent requests
+        result = await get_player_by_id(999)
+        self.assertIn("Error retrieving player data", result)
+
     async def test_get_player_recent_matches(self):
         """Test get_player_recent_matches function."""
         result = await get_player_recent_matches(123, 2)
         self.assertIn("Recent Matches for Player ID 123", result)
         self.assertIn("Match ID: 6789123", result)
         self.assertIn("Match ID: 6789124", result)
+        self.assertIn("Hero: Anti-Mage (ID: 1)", result)
         
         # Test with limit
         result = await get_player_recent_matches(123, 1)
@@ -85,6 +103,50 @@ class TestMCPTools(unittest.IsolatedAsyncioTestCase):
         self.assertIn("Duration: 40:00", result)
         self.assertIn("Score: 25 - 40", result)
         self.assertIn("Winner: Dire", result)
+        self.assertIn("Game Mode: Captains Mode", result)
+        self.assertIn("Lobby: Ranked", result)
+
+    async def test_get_matches_bulk(self):
+        """Test get_matches_bulk function."""
+        ctx = AsyncMock()
+        result = await get_matches_bulk([6789123, 999, 6789123], ctx)
+        self.assertIn("Retrieved 1 of 2 matches", result)
+        self.assertIn("Match ID: 6789123", result)
+        self.assertIn("Duration: 40:00", result)
+        self.assertIn("Match ID: 999\nError retrieving match data", result)
+        self.assertLess(
+            result.index("Match ID: 6789123"), result.index("Match ID: 999")
+        )
+        self.assertEqual(self.mock_request.call_count, 2)
+        self.assertEqual(ctx.report_progress.await_count, 2)
+        self.assertIn(
+            call(2, 2, "Match 999: Mock endpoint not found: matches/999"),
+            ctx.report_progress.await_args_list,
+        )
+
+        result = await get_matches_bulk([], ctx)
+        self.assertEqual(result, "No match IDs given.")
+        result = await get_matches_bulk(list(range(51)), ctx)
+        self.assertIn("the limit is 50", result)
+
+    async def test_get_players_bulk(self):
+        """Test get_players_bulk function."""
+        ctx = AsyncMock()
+        result = await get_players_bulk([123, 456, 123, 999], ctx)
+        self.assertIn("Players (3):", result)
+        self.assertIn(
+            "123 | MockPlayer (Mock Player) | Ancient 5 | 4500 | 500/400 (55.6%)",
+            result,
+        )
+        self.assertIn("456 | ProPlayer (Pro Player)", result)
+        self.assertIn("999 | Error:", result)
+        # Profile and win/loss for each distinct player, fetched once
+        self.assertEqual(self.mock_request.call_count, 6)
+        self.assertEqual(ctx.report_progress.await_count, 6)
+        self.assertEqual(ctx.report_progress.await_args_list[-1].args[:2], (6, 6))
+
+        result = await get_players_bulk([], ctx)
+        self.assertEqual(result, "No account IDs given.")
 
     async def test_get_player_win_loss(self):
         """Test get_player_win_loss function."""
@@ -102,6 +164,20 @@ class TestMCPTools(unittest.IsolatedAsyncioTestCase):
         self.assertIn("Dendi", result)
         self.assertIn("Account ID: 70388657", result)
 
+    async def test_search_player_uses_local_index(self):
+        """Known names are answered locally, unknown ones go upstream."""
+        index = PlayerNameIndex()
+        index.add(70388657, "Dendi")
+        with patch("src.opendota_server.server.player_names", index):
+            result = await search_player("Dendi")
+            self.assertIn("Account ID: 70388657", result)
+            self.assertNotIn("DendiClone", result)
+            self.mock_request.assert_not_called()
+
+            # Misses fall back to the upstream search
+            result = await search_player("Puppey")
+            self.mock_request.assert_called_once_with("search", {"q": "Puppey"})
+
     async def test_get_hero_stats(self):
         """Test get_hero_stats function."""
         # Test with specific hero ID
@@ -112,12 +188,37 @@ class TestMCPTools(unittest.IsolatedAsyncioTestCase):
         self.assertIn("Win Rates by Bracket:", result)
         self.assertIn("Pro Scene:", result)
         
+        # Test looking a hero up by name
+        result = await get_hero_stats(hero_name="antimag")
+        self.assertIn("Hero Stats for Anti-Mage", result)
+        result = await get_hero_stats(hero_name="Invoker")
+        self.assertIn("No hero found matching 'Invoker'", result)
+
         # Test without hero ID (should return all heroes)
         result = await get_hero_stats()
         self.assertIn("Hero Win Rates:", result)
         self.assertIn("Anti-Mage:", result) 
         self.assertIn("win rate", result)
 
+    async def test_get_hero_meta(self):
+        """Test get_hero_meta function."""
+        result = await get_hero_meta()
+        self.assertIn("Top Heroes by Win Rate (All Brackets)", result)
+        self.assertLess(result.index("1. Axe"), result.index("2. Anti-Mage"))
+
+        result = await get_hero_meta("ban_rate", "pro", limit=1)
+        self.assertIn("Top Heroes by Ban Rate (Pro)", result)
+        self.assertIn("Ban Rate:", result)
+        self.assertNotIn("2. ", result)
+
+        result = await get_hero_meta(bracket="divine", min_picks=100000)
+        self.assertIn("No heroes match these filters", result)
+
+        result = await get_hero_meta("ban_rate")
+        self.assertIn("only available for the pro bracket", result)
+        result = await get_hero_meta(bracket="mythic")
+        self.assertIn("Unknown bracket 'mythic'", result)
+
     async def test_get_player_heroes(self):
         """Test get_player_heroes function."""
         result = await get_player_heroes(123)
@@ -132,6 +233,15 @@ class TestMCPTools(unittest.IsolatedAsyncioTestCase):
         self.assertIn("SumaiL", result)
         self.assertIn("Team Liquid", result)
 
+        # Test filters
+        result = await get_pro_players(team_name="team liquid")
+        self.assertIn("SumaiL", result)
+        self.assertNotIn("Dendi", result)
+        result = await get_pro_players(country_code="ua", name_prefix="den")
+        self.assertIn("Dendi", result)
+        result = await get_pro_players(country_code="SE")
+        self.assertIn("No professional players match these filters", result)
+
     async def test_get_pro_matches(self):
         """Test get_pro_matches function."""
         result = await get_pro_matches()
@@ -186,11 +296,146 @@ class TestMCPTools(unittest.IsolatedAsyncioTestCase):
         self.assertIn("Recent Public Matches", result)
         self.assertIn("Match ID: 7234567", result)
         self.assertIn("Duration: 30:00", result)
+        self.assertIn("Radiant Heroes: Anti-Mage, Axe", result)
 
     async def test_get_match_heroes(self):
         """Test get_match_heroes function."""
         result = await get_match_heroes(6789123)
         self.assertIn("Heroes in Match 6789123", result)
 
+    async def test_get_player_match_history(self):
+        """Test get_player_match_history function."""
+        with patch(
+            "src.opendota_server.server.match_history", MatchHistoryStore()
+        ):
+            result = await get_player_match_history(123)
+            self.assertIn("Match History for Player ID 123", result)
+            self.assertIn("Win/Loss: 2/0 (100.0% win rate)", result)
+            self.assertIn("Average K/D/A: 9.0/4.0/13.5", result)
+            self.assertIn("- Axe: 1 games", result)
+            self.assertIn("- Match 6789124", result)
+
+            result = await get_player_match_history(123, hero_id=1)
+            self.assertIn("Match History for Player ID 123 on Anti-Mage", result)
+            self.assertIn("Matches: 1 (", result)
+            self.assertNotIn("6789124", result)
+
+            result = await get_player_match_history(123, limit=-1)
+            self.assertEqual(result.count("- Match "), 1)
+
+            result = await get_player_match_history(456)
+            self.assertIn("Error retrieving match history", result)
+
+    async def test_get_cache_stats(self):
+        """Test get_cache_stats function."""
+        cache = ResponseCache(
+            10, 100_000, load_compression_codec("zlib"), compress_min_bytes=0
+        )
+        body = b"[" + b"1," * 5000 + b"1]"
+        with patch("src.opendota_server.server.api_cache", cache), patch(
+            "src.opendota_server.server.cache_metrics", Counter()
+        ):
+            cache.put("x", None, len(body), body=body)
+            cache.get("x").data
+            result = await get_cache_stats()
+        self.assertIn("Entries: 1 (", result)
+        self.assertIn("Compression: zlib, 1 entries", result)
+        self.assertRegex(result, r"\d{2,}\.\dx ratio")
+        self.assertIn("(1 reads)", result)
+
+        with patch("src.opendota_server.server.api_cache", ResponseCache(10, 1000)):
+            self.assertIn("Compression: off", await get_cache_stats())
+
+    async def test_run_batch(self):
+        """Test run_batch function."""
+        result = await run_batch(
+            [
+                {"tool": "get_player_win_loss", "arguments": {"account_id": 123}},
+                {"tool": "get_heroes"},
+                {"tool": "delete_everything"},
+                {"tool": ["get_heroes"]},
+                {"tool": "get_match_data", "arguments": {"id": 1}},
+            ],
+            AsyncMock(),
+        )
+        self.assertIn("Ran 5 tool calls sharing 2 upstream requests", result)
+        self.assertIn("get_player_win_loss(account_id=123):", result)
+        self.assertIn("Win/Loss Record for Player ID 123", result)
+        self.assertIn("Dota 2 Heroes", result)
+        self.assertIn("Error: Unknown tool 'delete_everything'", result)
+        self.assertIn("Error: Unknown tool ['get_heroes']", result)
+        self.assertIn("Error: Invalid arguments", result)
+
+        result = await run_batch([], AsyncMock())
+        self.assertEqual(result, "No tool calls given.")
+
+    async def test_run_batch_validates_like_direct_calls(self):
+        """Batched arguments are coerced and validated by the tool's schema."""
+        result = await run_batch(
+            [
+                {
+                    "tool": "get_player_recent_matches",
+                    "arguments": {"account_id": "123", "limit": "1"},
+                },
+                {"tool": "get_player_totals", "arguments": {"account_id": "abc"}},
+            ],
+            AsyncMock(),
+        )
+        self.assertIn("Recent Matches for Player ID 123", result)
+        self.assertIn("Match 1:", result)
+        self.assertNotIn("Match 2:", result)
+        self.assertIn("Error: Invalid arguments: account_id:", result)
+
+    async def test_batch_plans_match_tool_requests(self):
+        """Every batch planner lists exactly the endpoints its tool requests."""
+        examples = {
+            "get_player_by_id": {"account_id": 123},
+            "get_player_recent_matches": {"account_id": 123},
+            "get_player_win_loss": {"account_id": 123},
+            "get_player_heroes": {"account_id": 123},
+            "get_player_match_history": {"account_id": 123, "hero_name": "axe"},
+            "get_player_peers": {"account_id": 123},
+            "get_player_totals": {"account_id": 123},
+            "get_player_rankings": {"account_id": 123},
+            "get_player_wordcloud": {"account_id": 123},
+            "get_match_data": {"match_id": 6789123},
+            "get_match_heroes": {"match_id": 6789123},
+            "get_hero_stats": {"hero_name": "axe"},
+            "get_hero_meta": {},
+            "get_heroes": {},
+            "get_pro_players": {},
+            "get_pro_matches": {},
+            "get_public_matches": {},
+            "get_team_info": {"team_id": 1},
+            "search_player": {"query": "Mock"},
+            "get_cache_stats": {},
+        }
+        self.assertEqual(set(BATCH_PLANS), set(examples))
+        # Tools left out of batches take a Context and fan out on their own
+        tools = {tool.name for tool in mcp._tool_manager.list_tools()}
+        self.assertEqual(
+            tools - set(BATCH_PLANS),
+            {"get_matches_bulk", "get_players_bulk", "run_batch"},
+        )
+
+        for name, arguments in examples.items():
+            tool = mcp._tool_manager.get_tool(name)
+            validated = tool.fn_metadata.arg_model.model_validate(
+                arguments
+            ).model_dump_one_level()
+            self.mock_request.reset_mock()
+            with patch(
+                "src.opendota_server.server.api_cache", ResponseCache(10, 1000)
+            ), patch(
+                "src.opendota_server.server.match_history", MatchHistoryStore()
+            ):
+                await tool.fn(**validated)
+            requested = {
+                c.args[0]
+                for c in self.mock_request.call_args_list
+                if len(c.args) < 2 and not c.kwargs.get("params")
+            }
+            self.assertEqual(set(BATCH_PLANS[name](validated)), requested, name)
+
 if __name__ == "__main__":
     unittest.main()
@@ -80,6 +80,36 @@ MOCK_RESPONSES = {
         "lose": 400,
     },
     
+    # Player match history
+    "players/123/matches": [
+        {
+            "match_id": 6789124,
+            "player_slot": 1,
+            "radiant_win": True,
+            "duration": 1800,
+            "game_mode": 22,
+            "lobby_type": 7,
+            "hero_id": 2,
+            "start_time": 1593100000,
+            "kills": 8,
+            "deaths": 3,
+            "assists": 12,
+        },
+        {
+            "match_id": 6789123,
+            "player_slot": 128,
+            "radiant_win": False,
+            "duration": 2400,
+            "game_mode": 2,
+            "lobby_type": 7,
+            "hero_id": 1,
+            "start_time": 1593000000,
+            "kills": 10,
+            "deaths": 5,
+            "assists": 15,
+        },
+    ],
+    
     # Player recent matches
     "players/123/recentMatches": [
         {
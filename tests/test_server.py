@@ -5,18 +5,43 @@ Unit tests for the OpenDota MCP Server functionality.
 import asyncio
 import os
 import sys
+import tempfile
+import time
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, PropertyMock, create_autospec, patch
+
+import httpx
+import numpy as np
+from mcp.server.fastmcp import Context
 
 # Add the src directory to the path so we can import the modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from src.opendota_server import server
 from src.opendota_server.server import (
+    CircuitBreaker,
+    DiskCache,
+    HeroIndex,
+    HeroStatsTable,
+    MatchHistoryStore,
+    PlayerNameIndex,
+    ProPlayerDirectory,
+    RateLimiter,
+    ResponseCache,
+    close_http_client,
     format_duration,
     format_rank_tier,
     format_timestamp,
+    gather_bounded,
     get_cache_key,
+    get_cache_ttl,
+    get_endpoint_route,
+    get_http_client,
+    load_json_decoder,
+    make_opendota_request,
     parse_player,
+    parse_ttl_overrides,
+    project_match,
 )
 
 
@@ -60,6 +85,63 @@ class TestHelperFunctions(unittest.TestCase):
             "matches?limit=5&offset=10",
         )
 
+    def test_get_cache_ttl(self):
+        """Test the per-endpoint cache TTL policy."""
+        self.assertIsNone(get_cache_ttl("matches/6789123"))
+        self.assertEqual(get_cache_ttl("heroes"), 24 * 3600)
+        self.assertEqual(get_cache_ttl("publicMatches"), 30)
+        self.assertEqual(get_cache_ttl("players/123/recentMatches"), 60)
+        self.assertEqual(get_cache_ttl("players/123/wl"), 300)
+        self.assertEqual(get_cache_ttl("health"), 0)
+
+    def test_parse_ttl_overrides(self):
+        """Test parsing of cache TTL overrides from configuration."""
+        self.assertEqual(
+            parse_ttl_overrides("heroStats=60, matches/\\d+=forever,bad,x=y"),
+            [("heroStats", 60.0), ("matches/\\d+", None)],
+        )
+        self.assertEqual(parse_ttl_overrides(""), [])
+
+    def test_project_match(self):
+        """Test trimming a match document to the fields tools read."""
+        match = {
+            "match_id": 1,
+            "duration": 2400,
+            "radiant_gold_adv": [0, 100, 250],
+            "chat": [{"key": "gg"}],
+            "players": [
+                {"account_id": 7, "kills": 3, "gold_t": [0, 200], "purchase_log": []}
+            ],
+        }
+        self.assertEqual(
+            project_match(match),
+            {
+                "match_id": 1,
+                "duration": 2400,
+                "players": [{"account_id": 7, "kills": 3}],
+            },
+        )
+        # Errors and unrecognised payloads pass through untouched
+        self.assertEqual(project_match({"error": "x"}), {"error": "x"})
+
+        with patch.object(server, "CACHE_FULL_DOCUMENTS", True):
+            self.assertIsNone(server.get_projection("matches/1"))
+        self.assertIs(server.get_projection("matches/1"), project_match)
+        self.assertIsNone(server.get_projection("heroes"))
+
+    def test_load_json_decoder(self):
+        """Test JSON backend selection and fallback."""
+        name, decode = load_json_decoder("json")
+        self.assertEqual(name, "json")
+        self.assertEqual(decode(b'{"a": [1, 2]}'), {"a": [1, 2]})
+
+        name, decode = load_json_decoder("no-such-backend")
+        self.assertEqual(name, "json")
+
+        name, decode = load_json_decoder("auto")
+        self.assertIn(name, ("orjson", "msgspec", "json"))
+        self.assertEqual(decode(b'[{"id": 1}]'), [{"id": 1}])
+
     def test_parse_player(self):
         """Test the parse_player function."""
         # Test with minimal data
@@ -101,5 +183,1205 @@ class TestHelperFunctions(unittest.TestCase):
         self.assertEqual(player.team_id, 789)
 
 
+class TestResponseCache(unittest.TestCase):
+    """Test case for the bounded LRU response cache."""
+
+    def test_evicts_least_recently_used_entry(self):
+        """The least recently used entry goes first when the count is exceeded."""
+        cache = ResponseCache(max_entries=2, max_bytes=1000)
+        cache.put("a", 1, 10)
+        cache.put("b", 2, 10)
+        cache.get("a")
+        cache.put("c", 3, 10)
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+
+    def test_evicts_to_stay_within_byte_budget(self):
+        """Entries are evicted until the byte budget is respected."""
+        cache = ResponseCache(max_entries=10, max_bytes=100)
+        cache.put("a", 1, 40)
+        cache.put("b", 2, 40)
+        cache.put("c", 3, 40)
+
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.total_bytes, 80)
+
+        # Oversized entries are never cached
+        cache.put("huge", 4, 500)
+        self.assertNotIn("huge", cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_replacing_entry_updates_size(self):
+        """Re-storing a key replaces the old entry and its size."""
+        cache = ResponseCache(max_entries=10, max_bytes=100)
+        cache.put("a", 1, 40)
+        cache.put("a", 2, 10)
+
+        self.assertEqual(cache.get("a").data, 2)
+        self.assertEqual(cache.total_bytes, 10)
+
+    def test_ttl_controls_expiry(self):
+        """Entries expire by their own TTL; None never expires and 0 isn't stored."""
+        cache = ResponseCache(max_entries=10, max_bytes=100)
+        cache.put("stale", 1, 10, ttl=-1)
+        cache.put("old", 1, 10, ttl=-(server.CACHE_MAX_STALENESS + 1))
+        cache.put("forever", 2, 10, ttl=None)
+        cache.put("skip", 3, 10, ttl=0)
+
+        self.assertFalse(cache.get("stale").is_fresh())
+        self.assertTrue(cache.get("stale").is_servable_stale())
+        self.assertFalse(cache.get("old").is_servable_stale())
+        self.assertTrue(cache.get("forever").is_fresh())
+        self.assertNotIn("skip", cache)
+
+        # Entries still within the staleness window are kept
+        self.assertEqual(cache.purge_expired(), 1)
+        self.assertNotIn("old", cache)
+        self.assertIn("stale", cache)
+
+    def test_expiry_index_skips_replaced_entries(self):
+        """Replaced entries don't leave stale expiry times behind."""
+        cache = ResponseCache(max_entries=10, max_bytes=100)
+        too_old = -(server.CACHE_MAX_STALENESS + 1)
+        cache.put("a", 1, 10, ttl=too_old)
+        cache.put("a", 2, 10, ttl=60)
+        cache.put("b", 3, 10, ttl=30)
+        cache.put("c", 4, 10, ttl=too_old)
+
+        self.assertEqual(cache.purge_expired(), 1)
+        self.assertEqual(cache.get("a").data, 2)
+        self.assertNotIn("c", cache)
+        self.assertAlmostEqual(cache.next_expiry(), cache.get("b").evict_at, places=3)
+
+    def test_large_entries_are_compressed(self):
+        """Entries past the threshold are stored compressed and decoded on read."""
+        codec = server.load_compression_codec("zlib")
+        cache = ResponseCache(
+            max_entries=10, max_bytes=100_000, codec=codec, compress_min_bytes=1000
+        )
+        data = [{"id": i, "localized_name": "Anti-Mage"} for i in range(200)]
+        body = server.encode_json(data)
+        cache.put("heroes", data, len(body), body=body)
+        cache.put("small", {"id": 1}, 8, body=b'{"id":1}')
+
+        entry = cache.get("heroes")
+        self.assertIs(entry.codec, codec)
+        self.assertLess(entry.size, len(body) // 5)
+        self.assertEqual(cache.total_bytes, entry.size + 8)
+        self.assertEqual(entry.data, data)
+        self.assertIsNone(cache.get("small").codec)
+
+    def test_compression_codec_selection(self):
+        """Compression can be disabled and falls back to zlib."""
+        self.assertIsNone(server.load_compression_codec("none"))
+        self.assertEqual(server.load_compression_codec("zlib").name, "zlib")
+        self.assertIn(server.load_compression_codec("auto").name, ("zstd", "zlib"))
+        with patch.dict(sys.modules, {"zstandard": None}):
+            self.assertEqual(server.load_compression_codec("zstd").name, "zlib")
+
+    def test_cache_metrics_report_compression(self):
+        """Compression ratio and timings are reported with the cache counters."""
+        cache = ResponseCache(
+            10, 100_000, server.load_compression_codec("zlib"), compress_min_bytes=0
+        )
+        body = b"[" + b"1," * 5000 + b"1]"
+        with patch.object(server, "api_cache", cache), patch.object(
+            server, "cache_metrics", server.Counter()
+        ):
+            cache.put("x", None, len(body), body=body)
+            cache.get("x").data
+            metrics = server.get_cache_metrics()
+
+        self.assertEqual(metrics["entries"], 1)
+        self.assertEqual(metrics["codec"], "zlib")
+        self.assertGreater(metrics["compression_ratio"], 10)
+        self.assertEqual(metrics["decompressions"], 1)
+        self.assertIn("avg_decompress_ms", metrics)
+
+
+class TestHeroIndex(unittest.TestCase):
+    """Test case for the hero lookup index."""
+
+    def setUp(self):
+        self.index = HeroIndex(
+            [
+                {"id": 2, "name": "npc_dota_hero_axe", "localized_name": "Axe"},
+                {
+                    "id": 1,
+                    "name": "npc_dota_hero_antimage",
+                    "localized_name": "Anti-Mage",
+                },
+                {
+                    "id": 11,
+                    "name": "npc_dota_hero_nevermore",
+                    "localized_name": "Shadow Fiend",
+                },
+                {"bad": "row"},
+            ]
+        )
+
+    def test_lookup_by_id(self):
+        """IDs resolve to names, with a placeholder for unknown heroes."""
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual([h["id"] for h in self.index.heroes], [1, 2, 11])
+        self.assertEqual(self.index.name(2), "Axe")
+        self.assertEqual(self.index.name(999), "Hero 999")
+        self.assertIsNone(self.index.get(999))
+
+    def test_lookup_by_name(self):
+        """Names resolve exactly, by internal name and approximately."""
+        self.assertEqual(self.index.find("anti-mage"), 1)
+        self.assertEqual(self.index.find("nevermore"), 11)
+        self.assertEqual(self.index.find("shadow fiend"), 11)
+        self.assertEqual(self.index.find("Shadw Fiend"), 11)
+        self.assertIsNone(self.index.find("Invoker"))
+        self.assertIsNone(self.index.find(""))
+
+    def test_non_list_payload_builds_empty_index(self):
+        """An error payload yields an empty index."""
+        index = HeroIndex({"error": "down"})
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.name(1), "Hero 1")
+
+
+class TestHeroStatsTable(unittest.TestCase):
+    """Test case for the columnar heroStats table."""
+
+    def setUp(self):
+        self.table = HeroStatsTable(
+            [
+                {"id": 2, "localized_name": "Axe", "1_pick": 10, "1_win": 6},
+                {
+                    "id": 1,
+                    "localized_name": "Anti-Mage",
+                    "1_pick": 100,
+                    "1_win": 50,
+                    "8_pick": 100,
+                    "8_win": 70,
+                    "pro_pick": 4,
+                    "pro_win": 1,
+                    "pro_ban": 9,
+                },
+                {"hero_id": 3, "1_pick": None},
+            ]
+        )
+
+    def test_rows_are_indexed_by_hero_id(self):
+        """Rows are found by id or hero_id."""
+        self.assertEqual(len(self.table), 3)
+        self.assertEqual(self.table.row(1), 1)
+        self.assertEqual(self.table.row(3), 2)
+        self.assertIsNone(self.table.row(99))
+
+    def test_win_rates_are_vectorized(self):
+        """Bracket, overall and pro win rates are precomputed per hero."""
+        row = self.table.row(1)
+        self.assertEqual(self.table.picks.shape, (3, 8))
+        self.assertAlmostEqual(self.table.win_rates[row, 0], 50.0)
+        self.assertAlmostEqual(self.table.win_rates[row, 7], 70.0)
+        self.assertAlmostEqual(self.table.overall_win_rates[row], 60.0)
+        self.assertAlmostEqual(self.table.pro_win_rates[row], 25.0)
+        self.assertEqual(self.table.overall_win_rates[self.table.row(3)], 0.0)
+
+    def test_summary_is_sorted_by_name(self):
+        """The summary lists heroes by name, unnamed heroes first."""
+        self.assertEqual(
+            self.table.summary(),
+            "Hero Win Rates:\n\n"
+            "Hero 3: 0.00% win rate\n"
+            "Anti-Mage: 60.00% win rate\n"
+            "Axe: 60.00% win rate",
+        )
+        self.assertIs(self.table.summary(), self.table.summary())
+
+    def test_top_uses_mask_and_orders_best_first(self):
+        """Top-k selection honours the mask and returns rows best first."""
+        values = np.array([5.0, 9.0, 1.0, 7.0, 3.0])
+        self.assertEqual(self.table.top(values, 2).tolist(), [1, 3])
+        mask = np.array([True, False, True, True, True])
+        self.assertEqual(self.table.top(values, 3, mask).tolist(), [3, 0, 4])
+        self.assertEqual(self.table.top(values, 10, mask).tolist(), [3, 0, 4, 2])
+        self.assertEqual(self.table.top(values, 0).tolist(), [])
+
+    def test_columns_by_bracket(self):
+        """Columns are selected per bracket, with ban rates only for pro."""
+        row = self.table.row(1)
+        self.assertEqual(self.table.columns(8)["picks"][row], 100)
+        self.assertAlmostEqual(self.table.columns(1)["pick_rate"][row], 10000 / 11)
+        self.assertIn("ban_rate", self.table.columns(0))
+        self.assertNotIn("ban_rate", self.table.columns(None))
+        self.assertEqual(self.table.columns(None)["picks"][row], 200)
+
+    def test_parse_bracket(self):
+        """Brackets are accepted by number, name, pro or all."""
+        self.assertIsNone(server.parse_bracket("all"))
+        self.assertEqual(server.parse_bracket("pro"), 0)
+        self.assertEqual(server.parse_bracket("Divine"), 7)
+        self.assertEqual(server.parse_bracket(3), 3)
+        with self.assertRaises(ValueError):
+            server.parse_bracket("9")
+
+    def test_empty_payload(self):
+        """A non-list payload yields an empty table."""
+        table = HeroStatsTable({"error": "x"})
+        self.assertEqual(len(table), 0)
+        self.assertEqual(table.picks.shape, (0, 8))
+
+
+class TestProPlayerDirectory(unittest.TestCase):
+    """Test case for the indexed pro player directory."""
+
+    @staticmethod
+    def player(account_id, name, team_id, team_name, country_code, **extra):
+        return {
+            "account_id": account_id,
+            "name": name,
+            "team_id": team_id,
+            "team_name": team_name,
+            "country_code": country_code,
+            **extra,
+        }
+
+    def setUp(self):
+        self.directory = ProPlayerDirectory(
+            [
+                self.player(3, "Yatoro", 2, "Spirit", "UA"),
+                self.player(1, "Miposhka", 2, "Spirit", "RU"),
+                self.player(2, "Miracle-", 5, "Nigma", "JO"),
+                self.player(4, "Dendi", None, None, "ua", personaname="NaVi.Dendi"),
+                "not a player",
+            ]
+        )
+
+    def test_players_are_presorted(self):
+        """Players are ordered by team name, then name, with no team first."""
+        self.assertEqual(
+            [p["account_id"] for p in self.directory.filter()], [4, 2, 1, 3]
+        )
+        self.assertEqual(self.directory.by_account_id[2]["name"], "Miracle-")
+
+    def test_hash_filters(self):
+        """Team and country filters are exact and case-insensitive."""
+        self.assertEqual(
+            [p["name"] for p in self.directory.filter(team_id=2)],
+            ["Miposhka", "Yatoro"],
+        )
+        self.assertEqual(len(self.directory.filter(team_name="spirit")), 2)
+        self.assertEqual(
+            [p["name"] for p in self.directory.filter(country_code="UA")],
+            ["Dendi", "Yatoro"],
+        )
+        self.assertEqual(self.directory.filter(team_id=99), [])
+
+    def test_name_prefix_and_combined_filters(self):
+        """Name prefixes match names and persona names; filters combine."""
+        self.assertEqual(
+            [p["name"] for p in self.directory.filter(name_prefix="mi")],
+            ["Miracle-", "Miposhka"],
+        )
+        self.assertEqual(
+            [p["name"] for p in self.directory.filter(name_prefix="navi")], ["Dendi"]
+        )
+        self.assertEqual(
+            [p["name"] for p in self.directory.filter(team_id=2, name_prefix="mi")],
+            ["Miposhka"],
+        )
+
+
+class TestPlayerNameIndex(unittest.TestCase):
+    """Test case for the local trigram player-name index."""
+
+    def setUp(self):
+        self.index = PlayerNameIndex(max_players=3)
+        self.index.add(70388657, "Dendi", "NaVi.Dendi")
+        self.index.add(111620041, "SumaiL")
+        self.index.add(19672354, "N0tail", "Notail")
+
+    def test_exact_and_fuzzy_matches(self):
+        """Exact names score 1 and near misses still match."""
+        matches = self.index.search("dendi")
+        self.assertEqual(matches[0].account_id, 70388657)
+        self.assertEqual(matches[0].name, "Dendi")
+        self.assertEqual(matches[0].similarity, 1.0)
+
+        matches = self.index.search("sumail_")
+        self.assertEqual(matches[0].account_id, 111620041)
+        self.assertEqual(self.index.search("navidendi")[0].name, "NaVi.Dendi")
+        self.assertEqual(self.index.search("zzzz"), [])
+        self.assertEqual(self.index.search("!!"), [])
+
+    def test_renamed_player_drops_old_name(self):
+        """Re-adding a player replaces its indexed names."""
+        self.index.add(111620041, "Suma1L")
+        self.assertEqual(self.index.search("sumail", cutoff=0.9), [])
+        self.assertEqual(self.index.search("suma1l")[0].account_id, 111620041)
+
+    def test_oldest_players_are_evicted(self):
+        """The index holds at most max_players players."""
+        self.index.add(1, "Miracle-")
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.search("dendi"), [])
+        self.index.add("not an id", "Ghost")
+        self.assertEqual(len(self.index), 3)
+
+    def test_responses_feed_the_index(self):
+        """Profiles and pro player lists are indexed by endpoint."""
+        index = PlayerNameIndex()
+        with patch.object(server, "player_names", index):
+            server.index_player_names(
+                "players/123", {"profile": {"account_id": 123, "personaname": "Mock"}}
+            )
+            server.index_player_names(
+                "proPlayers", [{"account_id": 456, "name": "Pro", "personaname": "P"}]
+            )
+            server.index_player_names("heroes", [{"id": 1, "personaname": "Nope"}])
+        self.assertEqual(index.search("mock")[0].account_id, 123)
+        self.assertEqual(index.search("pro")[0].account_id, 456)
+        self.assertEqual(len(index), 2)
+
+
+class TestConstants(unittest.IsolatedAsyncioTestCase):
+    """Test case for the bundled constants snapshot and its refresh."""
+
+    def setUp(self):
+        patcher = patch.object(server, "_constants", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_snapshot_resolves_ids(self):
+        """The bundled snapshot resolves heroes, modes, lobbies and regions."""
+        constants = server.get_constants()
+        self.assertIs(server.get_constants(), constants)
+        self.assertEqual(constants.hero_name(1), "Anti-Mage")
+        self.assertEqual(constants.hero_name(9999), "Hero 9999")
+        self.assertEqual(constants.label("game_mode", 22), "All Draft")
+        self.assertEqual(constants.label("lobby_type", 7), "Ranked")
+        self.assertEqual(constants.label("region", 3), "Europe")
+        self.assertEqual(constants.label("region", 999), "999")
+        self.assertEqual(constants.hero_index.find("nevermore"), 11)
+
+    def test_unusable_snapshot_loads_empty(self):
+        """A missing snapshot leaves empty tables rather than failing."""
+        constants = server.load_constants_snapshot("/nonexistent/constants.json")
+        self.assertEqual(constants.tables, {})
+        self.assertEqual(constants.hero_name(1), "Hero 1")
+
+    async def test_refresh_merges_upstream_tables(self):
+        """Upstream adds new IDs; failed endpoints keep the current tables."""
+        upstream = {
+            "constants/heroes": {
+                "1": {"id": 1, "name": "npc_am", "localized_name": "AM"},
+                "200": {"id": 200, "name": "npc_new", "localized_name": "New"},
+            },
+            "constants/game_mode": {
+                "22": {"id": 22, "name": "game_mode_all_draft"},
+                "30": {"id": 30, "name": "game_mode_new_mode"},
+            },
+        }
+        requested = []
+
+        async def fake_request(endpoint, params=None):
+            requested.append(endpoint)
+            return upstream.get(endpoint, {"error": "down"})
+
+        before = server.get_constants()
+        with patch.object(server, "make_opendota_request", side_effect=fake_request):
+            self.assertFalse(await server.refresh_constants())
+
+        constants = server.get_constants()
+        self.assertIsNot(constants, before)
+        self.assertEqual(constants.hero_name(1), "AM")
+        self.assertEqual(constants.hero_name(200), "New")
+        self.assertEqual(constants.label("game_mode", 22), "All Draft")
+        self.assertEqual(constants.label("game_mode", 30), "New Mode")
+        self.assertEqual(constants.label("region", 3), "Europe")
+        self.assertNotIn("constants/items", requested)
+
+    async def test_hero_index_falls_back_to_snapshot(self):
+        """Hero names still resolve when the heroes endpoint fails."""
+        with patch.object(
+            server, "make_opendota_request", new=AsyncMock(return_value={"error": "x"})
+        ):
+            index = await server.get_hero_index()
+        self.assertEqual(index.name(2), "Axe")
+
+
+class TestDiskCache(unittest.TestCase):
+    """Test case for the persistent SQLite response cache."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_entries_survive_reopen(self):
+        """Entries written by one instance are readable by the next."""
+        cache = DiskCache(self.path, max_bytes=1000)
+        cache.put("heroes", b"[1, 2]", ttl=60)
+        cache.put("matches/1", b"{}", ttl=None)
+        cache.close()
+
+        cache = DiskCache(self.path, max_bytes=1000)
+        stored = cache.get("heroes")
+        self.assertEqual(stored.body, b"[1, 2]")
+        self.assertGreater(stored.expires_at, time.time())
+        self.assertTrue(cache.get("matches/1").is_fresh())
+        cache.close()
+
+    def test_expired_entries_are_kept_for_revalidation(self):
+        """Expired entries are kept for a while, then removed by compaction."""
+        cache = DiskCache(self.path, max_bytes=1000)
+        cache.put("recent", b"1", ttl=-1, etag='"abc"')
+        cache.put("old", b"1", ttl=-(server.DISK_CACHE_RETAIN_EXPIRED + 1))
+
+        stored = cache.get("recent")
+        self.assertFalse(stored.is_fresh())
+        self.assertEqual(stored.etag, '"abc"')
+        self.assertEqual(cache.compact(), 1)
+        self.assertIsNone(cache.get("old"))
+
+        cache.touch("recent", ttl=60)
+        self.assertTrue(cache.get("recent").is_fresh())
+        self.assertEqual(cache.get("recent").etag, '"abc"')
+        cache.close()
+
+    def test_compaction_enforces_byte_budget(self):
+        """Least recently used entries are dropped to fit the byte budget."""
+        cache = DiskCache(self.path, max_bytes=25)
+        cache.put("a", b"x" * 10, ttl=None)
+        cache.put("b", b"x" * 10, ttl=None)
+        cache.get("a")
+        cache.put("c", b"x" * 10, ttl=None)
+
+        cache.compact()
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        cache.close()
+
+
+class TestMatchHistoryStore(unittest.TestCase):
+    """Test case for the SQLite player match history store."""
+
+    def setUp(self):
+        self.store = MatchHistoryStore()
+        self.addCleanup(self.store.close)
+
+    @staticmethod
+    def match(match_id, hero_id=1, won=True, start_time=None):
+        return {
+            "match_id": match_id,
+            "start_time": start_time or 1700000000 + match_id,
+            "duration": 1800,
+            "hero_id": hero_id,
+            "player_slot": 0,
+            "radiant_win": won,
+            "kills": 10,
+            "deaths": 2,
+            "assists": 5,
+        }
+
+    def test_sync_state_tracks_newest_match(self):
+        """Synced players report their newest stored match."""
+        self.assertIsNone(self.store.sync_state(1))
+
+        self.store.add(1, [])
+        self.assertEqual(self.store.sync_state(1)[1:], (0, 0))
+
+        self.store.add(1, [self.match(5), self.match(9)])
+        self.assertEqual(self.store.sync_state(1)[1:], (9, 1700000009))
+
+    def test_duplicate_matches_are_ignored(self):
+        """Re-synced matches are not stored twice."""
+        self.assertEqual(self.store.add(1, [self.match(1), self.match(2)]), 2)
+        self.assertEqual(self.store.add(1, [self.match(2), self.match(3)]), 1)
+        self.assertEqual(self.store.totals(1)[0], 3)
+        self.assertEqual(self.store.add(2, [self.match(1)]), 1)
+
+    def test_aggregates(self):
+        """Totals, hero counts and latest matches are computed locally."""
+        self.store.add(
+            1,
+            [
+                self.match(1, hero_id=1, won=True),
+                self.match(2, hero_id=2, won=False),
+                self.match(3, hero_id=1, won=False),
+            ],
+        )
+
+        games, wins, kills, deaths, assists, first, last = self.store.totals(1)
+        self.assertEqual((games, wins), (3, 1))
+        self.assertEqual((kills, deaths, assists), (10, 2, 5))
+        self.assertEqual((first, last), (1700000001, 1700000003))
+        self.assertEqual(self.store.totals(1, hero_id=1)[:2], (2, 1))
+        self.assertEqual(self.store.heroes(1), [(1, 2, 1), (2, 1, 0)])
+        latest = self.store.recent(1, limit=2)
+        self.assertEqual([m["match_id"] for m in latest], [3, 2])
+        self.assertEqual(self.store.recent(1, hero_id=2)[0]["win"], 0)
+
+    def test_history_survives_reopen(self):
+        """A file-backed history is still there in the next session."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "nested", "match_history.db")
+            store = MatchHistoryStore(path)
+            store.add(1, [self.match(1)])
+            store.close()
+
+            store = MatchHistoryStore(path)
+            self.assertEqual(store.sync_state(1)[1], 1)
+            store.close()
+
+    def test_unusable_path_falls_back_to_memory(self):
+        """A history that can't be opened on disk is kept in memory."""
+        with tempfile.NamedTemporaryFile() as blocker:
+            store = MatchHistoryStore(os.path.join(blocker.name, "history.db"))
+            with self.assertLogs("opendota-server", "WARNING"):
+                store.add(1, [self.match(1)])
+            self.assertEqual(store.path, ":memory:")
+            store.close()
+
+    def test_default_path_follows_disk_cache(self):
+        """Histories default to the disk cache's directory, else ~/.cache."""
+        with patch.object(server, "DISK_CACHE_PATH", "/data/cache.db"):
+            self.assertEqual(
+                server.default_match_history_path(), "/data/match_history.db"
+            )
+        with patch.object(server, "DISK_CACHE_PATH", ""), patch.dict(
+            os.environ, {"XDG_CACHE_HOME": "/tmp/xdg"}
+        ):
+            self.assertEqual(
+                server.default_match_history_path(),
+                "/tmp/xdg/opendota-mcp-server/match_history.db",
+            )
+
+
+class TestServerLifespan(unittest.IsolatedAsyncioTestCase):
+    """Test case for resources owned by the server lifespan."""
+
+    def test_fastmcp_runs_the_lifespan(self):
+        """FastMCP keeps the lifespan rather than silently ignoring it."""
+        self.assertIs(server.mcp.settings.lifespan, server.server_lifespan)
+
+    async def test_sweeper_runs_in_serving_loop(self):
+        """The cache sweeper removes expired entries while the server runs."""
+        server.api_cache.clear()
+        server.api_cache.put("heroes", [], 10, ttl=-(server.CACHE_MAX_STALENESS + 1))
+
+        with patch.object(server, "startup", new=AsyncMock()) as startup, patch.object(
+            server, "refresh_constants", new=AsyncMock()
+        ) as refresh_constants:
+            async with server.server_lifespan(server.mcp):
+                await asyncio.sleep(0.05)
+                self.assertNotIn("heroes", server.api_cache)
+                startup.assert_awaited_once()
+                # Sessions start from the bundled snapshot
+                refresh_constants.assert_not_awaited()
+
+        self.assertIsNone(server._http_client)
+
+    async def test_new_session_picks_up_upstream_constants(self):
+        """A fresh session resolves upstream-only IDs without a full interval."""
+        upstream = {
+            "constants/heroes": {
+                "200": {"id": 200, "name": "npc_new", "localized_name": "New"}
+            }
+        }
+
+        async def fake_request(endpoint, params=None):
+            return upstream.get(endpoint, {"error": "down"})
+
+        with patch.object(server, "startup", new=AsyncMock()), patch.object(
+            server, "_constants", None
+        ), patch.object(
+            server, "make_opendota_request", side_effect=fake_request
+        ), patch.object(
+            server, "CONSTANTS_REFRESH_DELAY", 0.01
+        ), patch.object(
+            server, "rate_limiter", server.RateLimiter(60, per_day=2000)
+        ):
+            async with server.server_lifespan(server.mcp):
+                self.assertEqual(server.get_constants().hero_name(200), "Hero 200")
+                await asyncio.sleep(0.05)
+                self.assertEqual(server.get_constants().hero_name(200), "New")
+
+    async def test_constants_refresh_skipped_on_low_daily_budget(self):
+        """Refreshes leave a nearly spent daily budget to the tools."""
+        limiter = server.RateLimiter(60, per_day=8)
+        for _ in range(7):
+            await limiter.acquire()
+
+        with patch.object(server, "startup", new=AsyncMock()), patch.object(
+            server, "refresh_constants", new=AsyncMock()
+        ) as refresh_constants, patch.object(
+            server, "CONSTANTS_REFRESH_DELAY", 0.01
+        ), patch.object(
+            server, "rate_limiter", limiter
+        ):
+            async with server.server_lifespan(server.mcp):
+                await asyncio.sleep(0.05)
+                refresh_constants.assert_not_awaited()
+
+
+class TestHttpClient(unittest.IsolatedAsyncioTestCase):
+    """Test case for the shared HTTP client."""
+
+    async def asyncTearDown(self):
+        await close_http_client()
+
+    async def test_client_is_shared(self):
+        """The same pooled client is reused until it is closed."""
+        client = get_http_client()
+        self.assertIs(get_http_client(), client)
+        self.assertEqual(str(client.base_url), "https://api.opendota.com/api/")
+
+        await close_http_client()
+        self.assertTrue(client.is_closed)
+        self.assertIsNot(get_http_client(), client)
+
+    async def test_http2_falls_back_without_h2(self):
+        """Requesting HTTP/2 without h2 installed builds an HTTP/1.1 client."""
+        with patch.object(server, "HTTP2_ENABLED", True), patch.dict(
+            sys.modules, {"h2": None}
+        ), self.assertLogs("opendota-server", "WARNING") as logs:
+            client = get_http_client()
+        self.assertFalse(client.is_closed)
+        self.assertIn("using HTTP/1.1", logs.output[0])
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+    """Test case for the GCRA rate limiter."""
+
+    async def test_burst_is_limited_to_budget(self):
+        """A burst may use the whole budget but not overshoot it."""
+        limiter = RateLimiter(per_minute=3, per_day=100, max_wait=0)
+        self.assertEqual(limiter.remaining(), {"minute": 3, "day": 100})
+
+        results = [await limiter.acquire() for _ in range(4)]
+
+        self.assertEqual(results, [True, True, True, False])
+        self.assertEqual(limiter.remaining(), {"minute": 0, "day": 97})
+
+    async def test_daily_budget_is_enforced(self):
+        """The per-day budget applies even when the minute budget has room."""
+        limiter = RateLimiter(per_minute=60, per_day=2, max_wait=0)
+
+        results = [await limiter.acquire() for _ in range(3)]
+
+        self.assertEqual(results, [True, True, False])
+
+    async def test_rate_limit_headers_reduce_budget(self):
+        """Upstream rate limit headers lower the locally tracked budget."""
+        limiter = RateLimiter(per_minute=60)
+        response = httpx.Response(200, headers={"x-rate-limit-remaining-minute": "5"})
+
+        limiter.update_from_response(response)
+
+        self.assertEqual(limiter.remaining(), {"minute": 5})
+
+    async def test_429_blocks_until_retry_after(self):
+        """A 429 response blocks new requests for the Retry-After period."""
+        limiter = RateLimiter(per_minute=60, max_wait=1)
+
+        limiter.update_from_response(
+            httpx.Response(429, headers={"retry-after": "30"})
+        )
+
+        self.assertEqual(limiter.remaining(), {"minute": 0})
+        self.assertFalse(await limiter.acquire())
+
+
+class TestGatherBounded(unittest.IsolatedAsyncioTestCase):
+    """Test case for the bounded-concurrency gather helper."""
+
+    async def test_results_keep_order_and_respect_limit(self):
+        """Results come back in order with at most `limit` running at once."""
+        running = 0
+        peak = 0
+
+        async def work(value):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01 * (5 - value))
+            running -= 1
+            return value
+
+        results = await gather_bounded(*(work(i) for i in range(5)), limit=2)
+
+        self.assertEqual(results, [0, 1, 2, 3, 4])
+        self.assertEqual(peak, 2)
+
+    async def test_fanout_shrinks_with_remaining_budget(self):
+        """Fan-out never exceeds the request budget left, but keeps one slot."""
+        limiter = RateLimiter(per_minute=3, per_day=100)
+        with patch.object(server, "rate_limiter", limiter), patch.object(
+            server, "FANOUT_CONCURRENCY", 8
+        ):
+            self.assertEqual(server.fanout_limit(), 3)
+            self.assertEqual(server.fanout_limit(2), 2)
+            for _ in range(3):
+                await limiter.acquire()
+            self.assertEqual(server.fanout_limit(), 1)
+
+
+class TestReportProgress(unittest.IsolatedAsyncioTestCase):
+    """Test case for MCP progress notifications."""
+
+    async def test_message_reaches_the_context(self):
+        """Progress messages match the installed Context.report_progress."""
+        ctx = create_autospec(Context, instance=True)
+        await server.report_progress(ctx, 1, 2, "Match 1: Radiant win")
+        ctx.report_progress.assert_awaited_once_with(1, 2, "Match 1: Radiant win")
+
+    async def test_failures_are_ignored(self):
+        """A client that can't take progress doesn't fail the tool."""
+        ctx = AsyncMock()
+        ctx.report_progress.side_effect = RuntimeError("closed")
+        await server.report_progress(ctx, 1, 2, "done")
+        await server.report_progress(None, 1, 2, "done")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test case for the per-route circuit breaker."""
+
+    def test_opens_after_threshold_and_recovers(self):
+        """The circuit opens after repeated failures and closes on success."""
+        breaker = CircuitBreaker(threshold=2, cooldown=60)
+        breaker.record_failure("players/{id}")
+        self.assertTrue(breaker.allow("players/{id}"))
+        breaker.record_failure("players/{id}")
+        self.assertFalse(breaker.allow("players/{id}"))
+        self.assertTrue(breaker.allow("heroes"))
+
+        breaker.record_success("players/{id}")
+        self.assertTrue(breaker.allow("players/{id}"))
+
+    def test_half_open_failure_reopens(self):
+        """A failure after the cooldown re-opens the circuit immediately."""
+        breaker = CircuitBreaker(threshold=2, cooldown=0)
+        breaker.record_failure("heroes")
+        breaker.record_failure("heroes")
+        self.assertTrue(breaker.allow("heroes"))
+
+        breaker.cooldown = 60
+        breaker.record_failure("heroes")
+        self.assertFalse(breaker.allow("heroes"))
+
+    def test_routes_group_ids(self):
+        """Endpoints differing only by ID share a route."""
+        self.assertEqual(get_endpoint_route("players/123/wl"), "players/{id}/wl")
+        self.assertEqual(get_endpoint_route("heroStats"), "heroStats")
+
+
+class TestMakeOpenDotaRequest(unittest.IsolatedAsyncioTestCase):
+    """Test case for make_opendota_request against a mocked transport."""
+
+    async def asyncSetUp(self):
+        self.requests = []
+        self.responses = {}
+        self.active = self.max_active = 0
+        server.api_cache.clear()
+        patcher = patch.object(server, "RETRY_BASE_DELAY", 0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        server._http_client = httpx.AsyncClient(
+            base_url=server.OPENDOTA_API_BASE,
+            transport=httpx.MockTransport(self.handle),
+        )
+
+    async def asyncTearDown(self):
+        await close_http_client()
+        server.api_cache.clear()
+        server._server_error_counts.clear()
+        server.circuit_breaker.record_success("proMatches")
+
+    async def handle(self, request):
+        self.requests.append(request)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        path = request.url.path.removeprefix("/api/")
+        response = self.responses.get(path, httpx.Response(404))
+        if isinstance(response, list):
+            response = response.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def test_concurrent_requests_are_coalesced(self):
+        """Concurrent callers for the same resource share one upstream request."""
+        self.responses["heroes"] = httpx.Response(200, json=[{"id": 1}])
+
+        results = await asyncio.gather(
+            *(make_opendota_request("heroes") for _ in range(5))
+        )
+
+        self.assertEqual(len(self.requests), 1)
+        self.assertTrue(all(r == [{"id": 1}] for r in results))
+        self.assertEqual(server._inflight_requests, {})
+
+    async def test_coalesced_errors_reach_every_caller(self):
+        """An upstream error is returned to every coalesced caller."""
+        results = await asyncio.gather(
+            *(make_opendota_request("players/1") for _ in range(3))
+        )
+
+        self.assertEqual(len(self.requests), 1)
+        for result in results:
+            self.assertIn("Not found", result["error"])
+
+    async def test_cancelled_caller_does_not_cancel_shared_request(self):
+        """Cancelling one waiter leaves the shared request running for others."""
+        self.responses["heroes"] = httpx.Response(200, json=[{"id": 1}])
+
+        first = asyncio.ensure_future(make_opendota_request("heroes"))
+        second = asyncio.ensure_future(make_opendota_request("heroes"))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        self.assertEqual(await second, [{"id": 1}])
+        self.assertTrue(first.cancelled())
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_not_found_is_negatively_cached(self):
+        """A 404 is remembered so repeated lookups don't go upstream."""
+        first = await make_opendota_request("players/1")
+        second = await make_opendota_request("players/1")
+
+        self.assertEqual(first, second)
+        self.assertIn("Not found", second["error"])
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(server.api_cache.get("players/1").status, 404)
+
+    async def test_repeated_server_errors_hold_down_endpoint(self):
+        """Repeated 5xx responses pause requests to that endpoint."""
+        self.responses["proMatches"] = httpx.Response(503)
+
+        with patch.object(server, "MAX_RETRIES", 0):
+            for _ in range(server.SERVER_ERROR_THRESHOLD + 2):
+                result = await make_opendota_request("proMatches")
+                self.assertIn("server error", result["error"])
+
+        self.assertEqual(len(self.requests), server.SERVER_ERROR_THRESHOLD)
+
+    async def test_transient_failures_are_retried(self):
+        """Timeouts and 503s are retried until a response succeeds."""
+        self.responses["heroes"] = [
+            httpx.ReadTimeout("timed out"),
+            httpx.Response(503),
+            httpx.Response(200, json=[{"id": 1}]),
+        ]
+
+        self.assertEqual(await make_opendota_request("heroes"), [{"id": 1}])
+        self.assertEqual(len(self.requests), 3)
+
+    async def test_not_found_is_not_retried(self):
+        """Non-transient errors are returned without retrying."""
+        await make_opendota_request("players/1")
+
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_circuit_breaker_fails_fast(self):
+        """Once a route's circuit opens, requests fail without going upstream."""
+        self.responses["proMatches"] = httpx.Response(502)
+
+        with patch.object(server, "MAX_RETRIES", 0):
+            for _ in range(server.CIRCUIT_BREAKER_THRESHOLD):
+                server.api_cache.clear()
+                await make_opendota_request("proMatches")
+            server.api_cache.clear()
+            result = await make_opendota_request("proMatches")
+
+        self.assertIn("unavailable", result["error"])
+        self.assertEqual(len(self.requests), server.CIRCUIT_BREAKER_THRESHOLD)
+
+    async def test_success_resets_server_error_count(self):
+        """A successful response clears the endpoint's 5xx streak."""
+        self.responses["proMatches"] = httpx.Response(503)
+        await make_opendota_request("proMatches")
+        self.responses["proMatches"] = httpx.Response(200, json=[])
+        server.api_cache.clear()
+        await make_opendota_request("proMatches")
+
+        self.assertNotIn("proMatches", server._server_error_counts)
+
+    async def test_server_errors_keep_stale_entry(self):
+        """5xx responses never replace a servable entry; the hold-down extends it."""
+        self.responses["heroStats"] = httpx.Response(503)
+        server.api_cache.put("heroStats", [{"id": 1}], 10, ttl=-1)
+
+        with patch.object(server, "MAX_RETRIES", 0):
+            for _ in range(server.SERVER_ERROR_THRESHOLD + 2):
+                self.assertEqual(await make_opendota_request("heroStats"), [{"id": 1}])
+                await asyncio.gather(*server._inflight_requests.values())
+
+        entry = server.api_cache.get("heroStats")
+        self.assertEqual(entry.status, 200)
+        self.assertTrue(entry.is_fresh())
+        self.assertEqual(len(self.requests), server.SERVER_ERROR_THRESHOLD)
+
+    async def test_old_server_error_counts_are_swept(self):
+        """Error streaks for endpoints nobody requests again don't accumulate."""
+        self.responses["proMatches"] = httpx.Response(503)
+        with patch.object(server, "MAX_RETRIES", 0):
+            await make_opendota_request("proMatches")
+        self.assertIn("proMatches", server._server_error_counts)
+
+        server.cleanup_cache()
+        self.assertIn("proMatches", server._server_error_counts)
+        with patch.object(server, "SERVER_ERROR_HOLD_DOWN", -1):
+            server.cleanup_cache()
+        self.assertNotIn("proMatches", server._server_error_counts)
+
+    async def test_stale_entry_is_served_while_refreshing(self):
+        """An expired entry is returned at once and refreshed in the background."""
+        self.responses["heroStats"] = httpx.Response(200, json=[{"id": 2}])
+        server.api_cache.put("heroStats", [{"id": 1}], 10, ttl=-1)
+
+        self.assertEqual(await make_opendota_request("heroStats"), [{"id": 1}])
+        self.assertEqual(await make_opendota_request("heroStats"), [{"id": 1}])
+        await asyncio.gather(*server._inflight_requests.values())
+
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(await make_opendota_request("heroStats"), [{"id": 2}])
+
+    async def test_too_stale_entry_blocks_on_refresh(self):
+        """Entries past the staleness window are refetched before returning."""
+        self.responses["heroStats"] = httpx.Response(200, json=[{"id": 2}])
+        server.api_cache.put(
+            "heroStats", [{"id": 1}], 10, ttl=-(server.CACHE_MAX_STALENESS + 1)
+        )
+
+        self.assertEqual(await make_opendota_request("heroStats"), [{"id": 2}])
+
+    async def test_expired_entry_is_revalidated_with_etag(self):
+        """A 304 for an expired entry reuses the cached data with a new TTL."""
+        self.responses["heroStats"] = httpx.Response(304, headers={"etag": '"v1"'})
+        server.api_cache.put(
+            "heroStats",
+            [{"id": 1}],
+            10,
+            ttl=-(server.CACHE_MAX_STALENESS + 1),
+            etag='"v1"',
+            last_modified="Mon, 01 Jan 2024 00:00:00 GMT",
+        )
+        stored_at = server.api_cache.get("heroStats").stored_at
+
+        self.assertEqual(await make_opendota_request("heroStats"), [{"id": 1}])
+
+        request = self.requests[0]
+        self.assertEqual(request.headers["if-none-match"], '"v1"')
+        self.assertEqual(
+            request.headers["if-modified-since"], "Mon, 01 Jan 2024 00:00:00 GMT"
+        )
+        entry = server.api_cache.get("heroStats")
+        self.assertTrue(entry.is_fresh())
+        self.assertEqual(entry.stored_at, stored_at)
+
+    async def test_expired_disk_entry_is_revalidated(self):
+        """An expired disk entry is revalidated and its body reused on 304."""
+        self.responses["heroes"] = httpx.Response(304)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = DiskCache(os.path.join(tmpdir, "cache.db"), max_bytes=1000)
+            cache.put("heroes", b'[{"id": 1}]', ttl=-1, etag='"v1"')
+            with patch.object(server, "disk_cache", cache):
+                self.assertEqual(await make_opendota_request("heroes"), [{"id": 1}])
+                await asyncio.gather(*server._background_tasks)
+            self.assertTrue(cache.get("heroes").is_fresh())
+            cache.close()
+
+        self.assertEqual(self.requests[0].headers["if-none-match"], '"v1"')
+        self.assertTrue(server.api_cache.get("heroes").is_fresh())
+
+    async def test_validators_are_stored_from_responses(self):
+        """ETag and Last-Modified headers are kept with the cached response."""
+        self.responses["heroes"] = httpx.Response(
+            200, json=[], headers={"etag": 'W/"abc"', "last-modified": "yesterday"}
+        )
+
+        await make_opendota_request("heroes")
+
+        entry = server.api_cache.get("heroes")
+        self.assertEqual(entry.etag, 'W/"abc"')
+        self.assertEqual(entry.last_modified, "yesterday")
+        self.assertNotIn("if-none-match", self.requests[0].headers)
+
+    async def test_match_documents_are_projected_before_caching(self):
+        """Only the projected match is cached, and sized by its projection."""
+        match = {
+            "match_id": 42,
+            "radiant_win": True,
+            "radiant_gold_adv": list(range(3000)),
+            "players": [{"hero_id": 1, "kills": 2, "gold_t": list(range(3000))}],
+        }
+        self.responses["matches/42"] = httpx.Response(200, json=match)
+
+        data = await make_opendota_request("matches/42")
+
+        self.assertEqual(
+            data,
+            {
+                "match_id": 42,
+                "radiant_win": True,
+                "players": [{"hero_id": 1, "kills": 2}],
+            },
+        )
+        entry = server.api_cache.get("matches/42")
+        self.assertEqual(entry.data, data)
+        self.assertLess(entry.size, 200)
+
+    async def test_derived_index_is_rebuilt_only_when_source_changes(self):
+        """An index is reused until its source response is cached again."""
+        self.responses["heroes"] = [
+            httpx.Response(200, json=[{"id": 1, "localized_name": "Anti-Mage"}]),
+            httpx.Response(200, json=[{"id": 1, "localized_name": "Antimage"}]),
+        ]
+
+        first = await server.get_hero_index()
+        self.assertIs(await server.get_hero_index(), first)
+
+        server.api_cache.clear()
+        second = await server.get_hero_index()
+        self.assertIsNot(second, first)
+        self.assertEqual(second.name(1), "Antimage")
+        self.assertEqual(first.name(1), "Anti-Mage")
+        self.assertEqual(len(self.requests), 2)
+
+    async def test_fresh_derived_index_skips_decoding(self):
+        """A fresh cached response's index is reused without reading its data."""
+        self.responses["proPlayers"] = httpx.Response(
+            200, json=[{"account_id": 1, "name": "Miracle-", "team_id": 2}]
+        )
+        first = await server.get_derived_index("proPlayers", ProPlayerDirectory)
+
+        with patch.object(server, "make_opendota_request") as request, patch.object(
+            server.CacheEntry, "data", new_callable=PropertyMock
+        ) as data:
+            for _ in range(3):
+                self.assertIs(
+                    await server.get_derived_index("proPlayers", ProPlayerDirectory),
+                    first,
+                )
+        request.assert_not_called()
+        data.assert_not_called()
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_fetched_profiles_are_name_indexed(self):
+        """Player names in upstream responses reach the local name index."""
+        self.responses["players/77"] = httpx.Response(
+            200, json={"profile": {"account_id": 77, "personaname": "Topson"}}
+        )
+        with patch.object(server, "player_names", PlayerNameIndex()) as index:
+            await make_opendota_request("players/77")
+        self.assertEqual(index.search("topson")[0].account_id, 77)
+
+    async def test_bulk_matches_serve_cached_first(self):
+        """Cached matches are reported before upstream fetches complete."""
+        for match_id in (1, 2, 3):
+            self.responses[f"matches/{match_id}"] = httpx.Response(
+                200, json={"match_id": match_id, "duration": 60}
+            )
+        await make_opendota_request("matches/3")
+        self.requests.clear()
+
+        ctx = AsyncMock()
+        with patch.object(server, "FANOUT_CONCURRENCY", 1):
+            result = await server.get_matches_bulk([1, 2, 3], ctx)
+
+        self.assertIn("Retrieved 3 of 3 matches", result)
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(self.max_active, 1)
+        progress = [c.args for c in ctx.report_progress.await_args_list]
+        self.assertEqual([p[0] for p in progress], [1, 2, 3])
+        self.assertTrue(progress[0][2].startswith("Match 3:"))
+
+    async def test_batch_fetches_each_endpoint_once(self):
+        """Tools in a batch share one upstream request per endpoint."""
+        self.responses["players/5"] = httpx.Response(
+            200, json={"profile": {"account_id": 5, "personaname": "Ana"}}
+        )
+        self.responses["players/5/wl"] = httpx.Response(
+            200, json={"win": 3, "lose": 1}
+        )
+        self.responses["players/5/recentMatches"] = httpx.Response(200, json=[])
+        calls = [
+            {"tool": "get_player_by_id", "arguments": {"account_id": 5}},
+            {"tool": "get_player_win_loss", "arguments": {"account_id": 5}},
+            {"tool": "get_player_recent_matches", "arguments": {"account_id": 5}},
+        ]
+
+        # Nothing is cached, so only the batch can share the responses
+        with patch.object(server, "get_cache_ttl", return_value=0):
+            result = await server.run_batch(calls, AsyncMock())
+
+        self.assertEqual(len(self.requests), 3)
+        self.assertIn("Ran 3 tool calls sharing 3 upstream requests", result)
+        self.assertIn("Player: Ana", result)
+        self.assertIn("Win Rate: 75.00%", result)
+        self.assertIn("No recent matches found", result)
+        self.assertIsNone(server._batch_responses.get())
+
+    async def test_match_history_syncs_incrementally(self):
+        """After the backfill only matches newer than the stored ones are fetched."""
+        now = int(time.time())
+        self.responses["players/8/matches"] = [
+            httpx.Response(
+                200,
+                json=[
+                    {"match_id": 2, "start_time": now - 86400, "player_slot": 0},
+                    {"match_id": 1, "start_time": now - 5 * 86400, "player_slot": 0},
+                ],
+            ),
+            httpx.Response(
+                200,
+                json=[
+                    {"match_id": 3, "start_time": now - 60, "player_slot": 0},
+                    {"match_id": 2, "start_time": now - 86400, "player_slot": 0},
+                ],
+            ),
+        ]
+        store = MatchHistoryStore()
+        self.addCleanup(store.close)
+
+        with patch.object(server, "match_history", store):
+            self.assertEqual(await server.sync_match_history(8), 2)
+            # Within the sync interval the stored history is used as is
+            self.assertEqual(await server.sync_match_history(8), 0)
+            with patch.object(server, "MATCH_HISTORY_SYNC_INTERVAL", 0):
+                self.assertEqual(await server.sync_match_history(8), 1)
+
+        self.assertEqual(len(self.requests), 2)
+        backfill, update = (request.url.params for request in self.requests)
+        self.assertNotIn("date", backfill)
+        self.assertEqual(update["date"], "3")
+        self.assertEqual(
+            update.get_list("project"), list(server.MATCH_HISTORY_FIELDS)
+        )
+        self.assertEqual(store.totals(8)[0], 3)
+
+    async def test_disk_cache_serves_after_memory_is_cleared(self):
+        """A restart with an empty memory cache is served from disk."""
+        self.responses["heroes"] = httpx.Response(200, json=[{"id": 1}])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = DiskCache(os.path.join(tmpdir, "cache.db"), max_bytes=1000)
+            with patch.object(server, "disk_cache", cache):
+                await make_opendota_request("heroes")
+                await asyncio.gather(*server._background_tasks)
+                server.api_cache.clear()
+
+                self.assertEqual(await make_opendota_request("heroes"), [{"id": 1}])
+            cache.close()
+
+        self.assertEqual(len(self.requests), 1)
+
+
 if __name__ == "__main__":
     unittest.main()